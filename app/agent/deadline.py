@@ -0,0 +1,118 @@
+"""
+Deadline of the chat turn running in the current context.
+
+run_chat_turn sets the turn's deadline in a context variable around the
+agent run, so every LLM call and tool call made by the agent can be bounded
+by the time the turn has left instead of a fixed client timeout. A coalesced
+run answers several requests, so its Deadline can be extended while they wait.
+"""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar, Union
+
+
+T = TypeVar("T")
+
+# Threads for calls whose client has no per-call timeout (embeddings, Supabase RPC)
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="deadline")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call can't start or finish before the turn's deadline."""
+
+    def __init__(self):
+        super().__init__("Se agotó el tiempo de respuesta")
+
+
+class Deadline:
+    """Deadline that can be pushed back, for a run shared by several waiting requests."""
+
+    def __init__(self, at: float):
+        self.at = at
+
+    def extend(self, at: float) -> None:
+        """Move the deadline to at, if that is later."""
+        self.at = max(self.at, at)
+
+
+_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("turn_deadline", default=None)
+
+
+@contextmanager
+def turn_deadline(deadline: Union[float, Deadline, None]) -> Iterator[None]:
+    """
+    Set the deadline of the calls made inside the block.
+
+    Args:
+        deadline: time.monotonic() by which the calls must finish, or a Deadline
+            (extensions apply to the calls still to come), or None for no deadline
+    """
+    if isinstance(deadline, (int, float)):
+        deadline = Deadline(deadline)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def run_with_deadline(deadline: Union[float, Deadline, None], func: Callable[..., T], *args: Any) -> T:
+    """Call func under a deadline (for use as a thread pool target)."""
+    with turn_deadline(deadline):
+        return func(*args)
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Get the seconds left before the current deadline.
+
+    Returns:
+        Seconds left, or None when no deadline is set
+
+    Raises:
+        DeadlineExceeded: If the deadline already passed
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline.at - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return remaining
+
+
+def call_with_deadline(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run a blocking call, waiting for it at most until the current deadline.
+
+    For clients without a per-call timeout: on timeout the caller is
+    released and the call finishes in the background, its result discarded.
+    A deadline extended during the call is honored.
+
+    Args:
+        func: Blocking function
+        *args: Its arguments
+
+    Returns:
+        The function's result
+
+    Raises:
+        DeadlineExceeded: If the deadline passes first
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return func(*args)
+
+    future = _executor.submit(contextvars.copy_context().run, func, *args)
+    while True:
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            try:
+                remaining = remaining_time()
+            except DeadlineExceeded:
+                future.cancel()
+                raise
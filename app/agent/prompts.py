@@ -40,3 +40,22 @@ SYSTEM_PROMPT = """Eres el Dr. Wilmer Gálvez, candidato a la Alcaldía de El Al
 
 Recuerda: Tu credibilidad viene de tu honestidad. Es mejor admitir que no tienes una respuesta que inventar información.
 """
+
+CHITCHAT_PROMPT = """Este turno es una conversación breve (saludo, agradecimiento, despedida o confirmación) y no tienes acceso a tu base de conocimiento.
+
+- Responde en una o dos frases, con tu tono cercano de vecino alteño
+- No menciones cifras, proyectos ni propuestas específicas
+- Si el vecino quiere saber de tus propuestas, invítalo a preguntarte directamente por el tema que le interesa
+"""
+
+# Degraded answers, sent without the LLM when a turn runs out of time.
+# {passages} is a list of DEGRADED_PASSAGE_TEMPLATE items.
+DEGRADED_RESPONSE_TEMPLATE = """Vecino, en este momento estoy atendiendo muchas consultas y no alcancé a prepararte una respuesta completa. Esto es lo que dice mi programa sobre tu pregunta:
+
+{passages}
+
+Vuelve a preguntarme en un momento y te lo explico con más detalle. ¡Sin cola de paja!"""
+
+DEGRADED_PASSAGE_TEMPLATE = "- {content} _({source})_"
+
+DEGRADED_NO_CONTEXT_RESPONSE = """Vecino, en este momento estoy atendiendo muchas consultas y no alcancé a responderte. Por favor vuelve a escribirme en un momento: mi compromiso es responderte con la verdad. ¡Sin cola de paja!"""
@@ -0,0 +1,97 @@
+"""
+Cheap heuristic turn classifier that decides which model handles a chat turn.
+"""
+
+import re
+from app.config import settings
+from app.services.coalescing_service import normalize_message
+
+
+# Route names
+ROUTE_CHITCHAT = "chitchat"  # Greetings, thanks, acknowledgements: small model, no tools
+ROUTE_RAG = "rag"  # Program questions: RAG agent on the main model
+
+# Greetings, thank-yous, farewells and acknowledgements (on normalized text).
+# A turn is chit-chat only if it is made entirely of these phrases, optionally
+# addressing the candidate ("hola doctor", "ok muchas gracias")
+CHITCHAT_PHRASES = (
+    r"hola|holi|buenas|buenos dias|buen dia|buenas tardes|buenas noches|saludos|hey|"
+    r"gracias|muchas gracias|mil gracias|ok|okay|vale|listo|perfecto|genial|excelente|"
+    r"chau|chao|adios|hasta luego|hasta pronto|nos vemos|bien|muy bien|si|no|claro|"
+    r"entendido|entiendo|de acuerdo|bueno|muy bueno|super|dale|ya|jaja|jajaja|"
+    r"doctor|dr|wilmer|galvez|senor"
+)
+CHITCHAT_PATTERN = re.compile(rf"^(?:{CHITCHAT_PHRASES})(?: (?:{CHITCHAT_PHRASES}))*$")
+
+# Bare yes/no replies. Mid-conversation they usually answer the agent's own
+# offer ("¿Quieres saber más sobre...?"), so they need the RAG agent
+REPLY_PHRASES = r"si|no|claro|dale|ya|bueno|ok|okay|vale|de acuerdo|por favor|porfa|doctor|dr"
+REPLY_PATTERN = re.compile(rf"^(?:{REPLY_PHRASES})(?: (?:{REPLY_PHRASES}))*$")
+
+# Question words (normalized): their presence makes a turn a question, not small talk
+QUESTION_WORDS = frozenset((
+    "que", "como", "cual", "cuales", "cuando", "donde", "adonde", "quien", "quienes",
+    "cuanto", "cuanta", "cuantos", "cuantas", "porque",
+))
+
+# Word prefixes that signal a question about the government program
+PROGRAM_KEYWORD_PREFIXES = (
+    "propuest", "plan", "program", "proyect", "gobiern", "gestion", "alcald",
+    "corrup", "saquead", "agua", "salud", "hospital", "educa", "escuel", "colegio",
+    "segur", "transport", "trafico", "obra", "empleo", "trabaj", "vivienda",
+    "basura", "presupuest", "impuest", "mercad", "comerci", "gremi", "fejuve",
+    "upea", "libre", "tuto", "eleccion", "vot", "candidat", "compromis",
+)
+
+
+def classify_turn(message: str, conversation_history: list) -> str:
+    """
+    Classify a chat turn into a route without calling any model.
+
+    Only short turns made entirely of social phrases go to the chit-chat
+    route; anything with a question mark or question word, or that mentions
+    the program, is sent to the RAG agent so answers stay grounded in the
+    knowledge base ("Hola, ¿qué propones para los jóvenes?" is a RAG turn).
+    A bare "sí" / "no" / "claro" after earlier turns is also RAG: it is
+    usually the answer to an offer of more detail.
+
+    Args:
+        message: User's message
+        conversation_history: Previous conversation messages
+
+    Returns:
+        ROUTE_CHITCHAT or ROUTE_RAG
+    """
+    words = normalize_message(message).split()
+
+    if not words or len(words) > settings.router_chitchat_max_words:
+        return ROUTE_RAG
+
+    if "?" in message or "¿" in message or QUESTION_WORDS.intersection(words):
+        return ROUTE_RAG
+
+    if any(word.startswith(PROGRAM_KEYWORD_PREFIXES) for word in words):
+        return ROUTE_RAG
+
+    if conversation_history and REPLY_PATTERN.match(" ".join(words)):
+        return ROUTE_RAG
+
+    if CHITCHAT_PATTERN.match(" ".join(words)):
+        return ROUTE_CHITCHAT
+
+    return ROUTE_RAG
+
+
+def get_route_model(route: str) -> str:
+    """
+    Get the model name that serves a route.
+
+    Args:
+        route: Route name
+
+    Returns:
+        Model name configured for the route
+    """
+    if route == ROUTE_CHITCHAT:
+        return settings.router_small_model
+    return settings.groq_model
@@ -0,0 +1,73 @@
+"""
+Callback handler that streams agent events to the event loop and supports cancellation.
+"""
+
+import asyncio
+import threading
+from typing import Any
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from app.agent.tools import extract_citations
+
+
+class AgentRunCancelled(Exception):
+    """Raised inside the agent thread to stop a run nobody is listening to anymore."""
+
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """
+    Forwards LLM tokens and tool calls from the agent thread to an asyncio queue.
+
+    Events are tuples:
+    - ("text", token)
+    - ("tool_call", tool_call_id, tool_name, args)
+    - ("tool_result", tool_call_id, citations)
+
+    Calling cancel() makes the next LLM token, LLM call or tool call raise
+    AgentRunCancelled, which aborts the agent run in its worker thread.
+    Raw tool outputs are kept in tool_outputs (used for degraded answers).
+    """
+
+    # Propagate AgentRunCancelled instead of letting LangChain log and swallow it
+    raise_error = True
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.streamed_text = False
+        self.tool_outputs: list[str] = []
+        self._cancelled = threading.Event()
+        self._cancel_reason = ""
+
+    def cancel(self, reason: str = "El cliente cerró la conexión") -> None:
+        """Request the agent run to stop as soon as possible."""
+        self._cancel_reason = reason
+        self._cancelled.set()
+
+    def _check_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise AgentRunCancelled(self._cancel_reason)
+
+    def _emit(self, event: tuple) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def on_chat_model_start(self, serialized: dict, messages: list, **kwargs: Any) -> None:
+        self._check_cancelled()
+
+    def on_llm_start(self, serialized: dict, prompts: list, **kwargs: Any) -> None:
+        self._check_cancelled()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._check_cancelled()
+        if token:
+            self.streamed_text = True
+            self._emit(("text", token))
+
+    def on_tool_start(self, serialized: dict, input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._check_cancelled()
+        tool_name = (serialized or {}).get("name", "tool")
+        self._emit(("tool_call", str(run_id), tool_name, {"query": input_str}))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.tool_outputs.append(str(output))
+        self._emit(("tool_result", str(run_id), extract_citations(str(output))))
@@ -1,7 +1,121 @@
+import re
+import time
+import numpy as np
 from langchain.tools import Tool
 from langchain_core.documents import Document
-from app.db.supabase_client import get_vector_store
+from app.agent.deadline import call_with_deadline
+from app.db.supabase_client import get_vector_store, embeddings
 from app.config import settings
+from app.services.metrics import metrics
+from app.services.vector_index import maximal_marginal_relevance
+
+
+# Matches the "Fuente: <file>, Página <n>" lines written by search_knowledge_base
+SOURCE_PATTERN = re.compile(r"^Fuente: (?P<filename>.+?)(?:, Página (?P<page>\d+))?$", re.MULTILINE)
+
+
+def extract_citations(output: str) -> list[dict]:
+    """
+    Extract the cited sources from the output of the search tool.
+    
+    Args:
+        output: Formatted string returned by buscar_propuestas
+        
+    Returns:
+        List of unique {"filename", "page"} citations in result order
+    """
+    citations = []
+    for match in SOURCE_PATTERN.finditer(output):
+        citation = {
+            "filename": match.group("filename"),
+            "page": int(match.group("page")) if match.group("page") else None
+        }
+        if citation not in citations:
+            citations.append(citation)
+    return citations
+
+
+def parse_search_results(output: str) -> list[dict]:
+    """
+    Parse the output of the search tool back into passages.
+    
+    Args:
+        output: Formatted string returned by buscar_propuestas
+        
+    Returns:
+        List of {"source", "content"} passages in result order
+    """
+    passages = []
+    for block in output.split("\n---\n"):
+        source = re.search(r"^Fuente: (.+)$", block, re.MULTILINE)
+        content = re.search(r"^Contenido: (.*)", block, re.MULTILINE | re.DOTALL)
+        if source and content:
+            passages.append({"source": source.group(1), "content": content.group(1).strip()})
+    return passages
+
+
+def format_source(metadata: dict) -> str:
+    """Format a document's source as written in the tool output ("file, Página n")."""
+    source_info = metadata.get('filename', 'Desconocido')
+    if 'page' in metadata:
+        source_info += f", Página {metadata['page']}"
+    return source_info
+
+
+def retrieve_documents(query: str) -> list[Document]:
+    """
+    Retrieve the chunks passed to the LLM for a query.
+    
+    With MMR enabled, mmr_fetch_k candidates are fetched with their
+    embeddings and similarity_top_k of them are picked locally, trading a
+    little relevance for diversity so near-duplicate neighbouring chunks
+    don't crowd out other sections.
+    
+    Inside a chat turn with a deadline, the embedding and Supabase calls are
+    waited for only until the deadline (DeadlineExceeded after that).
+    
+    Args:
+        query: Search query
+        
+    Returns:
+        Up to similarity_top_k documents
+    """
+    vector_store = get_vector_store()
+    k = settings.similarity_top_k
+    
+    # The query embedding is cached and rate limited by the embeddings wrapper
+    if not settings.mmr_enabled:
+        return call_with_deadline(vector_store.similarity_search, query, k)
+    
+    query_vector = call_with_deadline(embeddings.embed_query, query)
+    with metrics.timer("retrieval.fetch"):
+        candidates = call_with_deadline(
+            vector_store.similarity_search_by_vector_returning_embeddings,
+            query_vector,
+            max(settings.mmr_fetch_k, k)
+        )
+    
+    vectors = [candidate[2] for candidate in candidates]
+    if not vectors or any(vector.shape != (len(query_vector),) for vector in vectors):
+        # match_wilmer_documents doesn't return embeddings: keep the similarity order
+        metrics.increment("retrieval.mmr.skipped")
+        return [candidate[0] for candidate in candidates[:k]]
+    
+    budget_seconds = settings.mmr_latency_budget_ms / 1000
+    start = time.perf_counter()
+    selected = maximal_marginal_relevance(
+        np.asarray(query_vector, dtype=np.float32),
+        np.stack(vectors),
+        k,
+        lambda_mult=settings.mmr_lambda,
+        budget_seconds=budget_seconds
+    )
+    elapsed = time.perf_counter() - start
+    metrics.observe("retrieval.mmr", elapsed)
+    if elapsed > budget_seconds:
+        metrics.increment("retrieval.mmr.over_budget")
+    
+    return [candidates[i][0] for i in selected]
 
 
 def create_rag_tool() -> Tool:
@@ -25,13 +139,8 @@ def create_rag_tool() -> Tool:
         Returns:
             Formatted string with relevant documents
         """
-        vector_store = get_vector_store()
-        
-        # Perform similarity search
-        results: list[Document] = vector_store.similarity_search(
-            query=query,
-            k=settings.similarity_top_k
-        )
+        # Perform similarity search (with MMR diversity reranking)
+        results: list[Document] = retrieve_documents(query)
         
         if not results:
             return "No se encontró información relevante en la base de conocimiento."
@@ -39,14 +148,9 @@ def create_rag_tool() -> Tool:
         # Format results
         formatted_results = []
         for i, doc in enumerate(results, 1):
-            metadata = doc.metadata
-            source_info = f"Fuente: {metadata.get('filename', 'Desconocido')}"
-            if 'page' in metadata:
-                source_info += f", Página {metadata['page']}"
-            
             formatted_results.append(
                 f"[Resultado {i}]\n"
-                f"{source_info}\n"
+                f"Fuente: {format_source(doc.metadata)}\n"
                 f"Contenido: {doc.page_content}\n"
             )
         
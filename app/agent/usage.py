@@ -0,0 +1,180 @@
+"""
+Token usage tracking and cost estimation for LLM calls.
+"""
+
+import threading
+import time
+from typing import Any, Iterator, Optional
+import groq
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import LLMResult, ChatGenerationChunk
+from langchain_groq import ChatGroq
+from pydantic import model_validator
+from app.agent.deadline import remaining_time
+from app.config import settings
+
+
+def cached_prompt_tokens(token_usage: Optional[dict]) -> int:
+    """Get the prompt tokens served from the provider's prompt cache (OpenAI-style usage dict)."""
+    details = (token_usage or {}).get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or 0
+
+
+class _UsageRecordingCompletions:
+    """
+    Proxy of the Groq completions client that keeps the raw usage of the last stream, per thread.
+
+    Under a turn deadline, requests go out without the SDK's retries (which
+    don't know about the deadline): each attempt times out with the time left
+    and failed attempts are retried here only while there is time for them.
+    """
+
+    # Backoff between attempts, as in the SDK
+    RETRY_BASE_DELAY = 0.5
+    RETRY_MAX_DELAY = 8.0
+
+    def __init__(self, inner: Any, max_retries: int):
+        self._inner = inner
+        self._max_retries = max_retries
+        self._local = threading.local()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def create(self, **kwargs: Any) -> Any:
+        if remaining_time() is None:
+            response = self._inner.create(**kwargs)
+        else:
+            response = self._create_before_deadline(kwargs)
+        return self._record(response) if kwargs.get("stream") else response
+
+    def _create_before_deadline(self, kwargs: dict) -> Any:
+        completions = self._inner._client.with_options(max_retries=0).chat.completions
+        for attempt in range(self._max_retries + 1):
+            try:
+                return completions.create(**{**kwargs, "timeout": remaining_time()})
+            except groq.APIError as e:
+                status = getattr(e, "status_code", None) or 0
+                retryable = isinstance(e, groq.APIConnectionError) or status in (408, 409, 429) or status >= 500
+                delay = min(self.RETRY_BASE_DELAY * 2 ** attempt, self.RETRY_MAX_DELAY)
+                # DeadlineExceeded when the attempt failed because the turn ran out of time
+                remaining = remaining_time()
+                if not retryable or attempt == self._max_retries or delay >= remaining:
+                    raise
+                time.sleep(delay)
+
+    def _record(self, stream: Any) -> Iterator[Any]:
+        self._local.usage = None
+        for chunk in stream:
+            data = chunk if isinstance(chunk, dict) else chunk.model_dump()
+            usage = (data.get("x_groq") or {}).get("usage") or data.get("usage")
+            if usage:
+                self._local.usage = usage
+            yield chunk
+
+    def last_usage(self) -> Optional[dict]:
+        return getattr(self._local, "usage", None)
+
+
+class UsageReportingChatGroq(ChatGroq):
+    """
+    ChatGroq that also reports prompt-cache hits when streaming.
+
+    langchain-groq keeps only input/output token counts from the streamed
+    usage, so the cached prompt tokens are read from the raw stream and added
+    as input_token_details.cache_read through one final empty chunk.
+
+    Inside a chat turn with a deadline (see app.agent.deadline), each request
+    times out when the turn runs out of time and is retried only while time
+    is left.
+    """
+
+    @model_validator(mode="after")
+    def record_stream_usage(self) -> "UsageReportingChatGroq":
+        if not isinstance(self.client, _UsageRecordingCompletions):
+            self.client = _UsageRecordingCompletions(self.client, self.max_retries)
+        return self
+
+    def _stream(
+        self,
+        messages: list,
+        stop: Optional[list] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        cached = cached_prompt_tokens(self.client.last_usage())
+        if cached:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                    "total_tokens": 0,
+                    "input_token_details": {"cache_read": cached},
+                }
+            ))
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Accumulates token usage over all LLM calls of a single chat turn."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0  # Part of input_tokens served from the prompt cache
+        self.output_tokens = 0
+
+    @property
+    def uncached_input_tokens(self) -> int:
+        return self.input_tokens - self.cached_input_tokens
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        """Add the usage reported by a finished LLM call."""
+        input_tokens = 0
+        cached_input_tokens = 0
+        output_tokens = 0
+
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+                    cached_input_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0)
+
+        # Non-streaming responses carry the raw usage (with cache details) in llm_output
+        if response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            if not input_tokens and not output_tokens:
+                input_tokens = token_usage.get("prompt_tokens", 0)
+                output_tokens = token_usage.get("completion_tokens", 0)
+            cached_input_tokens = cached_input_tokens or cached_prompt_tokens(token_usage)
+
+        with self._lock:
+            self.llm_calls += 1
+            self.input_tokens += input_tokens
+            self.cached_input_tokens += cached_input_tokens
+            self.output_tokens += output_tokens
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> float:
+    """
+    Estimate the USD cost of a model's token usage.
+
+    Args:
+        model: Model name
+        input_tokens: Prompt tokens (including cached ones)
+        output_tokens: Completion tokens
+        cached_input_tokens: Prompt tokens served from the provider's prompt cache
+
+    Returns:
+        Estimated cost in USD (0 for models without a configured price)
+    """
+    input_price, output_price = settings.llm_prices.get(model, (0.0, 0.0))
+    uncached = input_tokens - cached_input_tokens
+    cached_price = input_price * settings.llm_cached_input_price_ratio
+    return (uncached * input_price + cached_input_tokens * cached_price + output_tokens * output_price) / 1_000_000
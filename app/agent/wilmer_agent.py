@@ -1,9 +1,20 @@
-from langchain_groq import ChatGroq
 from langchain.agents import create_tool_calling_agent, AgentExecutor
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 from app.config import settings
-from app.agent.prompts import SYSTEM_PROMPT
+from app.agent.prompts import SYSTEM_PROMPT, CHITCHAT_PROMPT
 from app.agent.tools import create_rag_tool
+from app.agent.usage import UsageReportingChatGroq
+
+
+# Static prompt prefix, rendered once. Providers cache prompt prefixes byte
+# for byte, so these messages (and the tool definitions bound at agent
+# creation) are identical on every turn and all variable content (history,
+# user input, scratchpad) goes after them.
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
+CHITCHAT_SYSTEM_MESSAGE = SystemMessage(content=CHITCHAT_PROMPT)
 
 
 def create_wilmer_agent() -> AgentExecutor:
@@ -15,21 +26,23 @@ def create_wilmer_agent() -> AgentExecutor:
     """
     
     # Initialize Groq LLM
-    llm = ChatGroq(
+    llm = UsageReportingChatGroq(
         groq_api_key=settings.groq_api_key,
         model_name=settings.groq_model,
         temperature=0.7,
-        streaming=True
+        streaming=True,
+        # Ceiling for calls outside a chat turn (batch); chat turns pass the time they have left
+        timeout=settings.chat_deadline_seconds
     )
     
-    # Create tools list
+    # Create tools list (fixed order: the tool schema is part of the cached prefix)
     tools = [
         create_rag_tool(),
     ]
     
     # Create the Tool Calling prompt template
     prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_PROMPT),
+        SYSTEM_MESSAGE,
         ("placeholder", "{chat_history}"),
         ("human", "{input}"),
         ("placeholder", "{agent_scratchpad}"),
@@ -50,12 +63,41 @@ def create_wilmer_agent() -> AgentExecutor:
         # Custom error handling: if parsing fails, assume the output is the final answer (often happens with "Invalid Format: Missing 'Action:'")
         handle_parsing_errors=lambda error: str(error).split("Could not parse LLM output: `")[1].split("`")[0] if "Could not parse LLM output: `" in str(error) else "Lo siento, hubo un error técnico al procesar tu respuesta. Por favor intenta de nuevo.",
         max_iterations=5,
-        return_intermediate_steps=False
+        # Used to tell forced stops and parsing-error recoveries from normal answers
+        return_intermediate_steps=True
     )
     
     return agent_executor
 
 
+def create_chitchat_chain() -> Runnable:
+    """
+    Create the lightweight chain that answers chit-chat turns.
+    
+    Uses the small router model without tools, keeping the same persona.
+    
+    Returns:
+        Runnable: Chain taking {input, chat_history} and returning the answer text
+    """
+    
+    llm = UsageReportingChatGroq(
+        groq_api_key=settings.groq_api_key,
+        model_name=settings.router_small_model,
+        temperature=settings.router_small_temperature,
+        streaming=True,
+        timeout=settings.chat_deadline_seconds
+    )
+    
+    prompt = ChatPromptTemplate.from_messages([
+        SYSTEM_MESSAGE,
+        CHITCHAT_SYSTEM_MESSAGE,
+        ("placeholder", "{chat_history}"),
+        ("human", "{input}"),
+    ])
+    
+    return prompt | llm | StrOutputParser()
+
+
 # Singleton instance - lazily initialized
 _agent_executor = None
 
@@ -71,3 +113,19 @@ def get_agent() -> AgentExecutor:
     if _agent_executor is None:
         _agent_executor = create_wilmer_agent()
     return _agent_executor
+
+
+_chitchat_chain = None
+
+
+def get_chitchat_chain() -> Runnable:
+    """
+    Get the singleton chit-chat chain instance.
+    
+    Returns:
+        Runnable: The configured chit-chat chain
+    """
+    global _chitchat_chain
+    if _chitchat_chain is None:
+        _chitchat_chain = create_chitchat_chain()
+    return _chitchat_chain
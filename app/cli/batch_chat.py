@@ -0,0 +1,61 @@
+"""
+Answer a JSONL file of questions without going through the HTTP server.
+
+Each input line is {"id", "message", "conversation_history"} or a bare JSON
+string; one JSON result per question is written as soon as it finishes:
+
+    python -m app.cli.batch_chat preguntas.jsonl > respuestas.jsonl
+    python -m app.cli.batch_chat preguntas.jsonl --concurrency 8 --output respuestas.jsonl
+
+A summary (questions, unique, errors, wall time, query-embedding cache hit
+rate) is printed to stderr.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from app.config import settings
+from app.services.batch_service import parse_batch_lines, group_items, run_batch
+
+
+async def run(input_path: str, output, concurrency: int) -> None:
+    items = parse_batch_lines(Path(input_path).read_text(encoding="utf-8").splitlines())
+    unique = len(group_items(items))
+    print(f"{len(items)} preguntas ({unique} únicas), concurrencia {concurrency}", file=sys.stderr)
+
+    start = time.perf_counter()
+    errors = hits = misses = 0
+    async for result in run_batch(items, concurrency=concurrency):
+        errors += result.error is not None
+        hits += result.query_cache_hits
+        misses += result.query_cache_misses
+        output.write(result.model_dump_json() + "\n")
+        output.flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"Listo en {elapsed:.1f}s: {len(items)} respuestas, {errors} errores", file=sys.stderr)
+    if hits + misses:
+        print(
+            f"Caché de embeddings de consultas: {hits}/{hits + misses} búsquedas ({hits / (hits + misses):.0%})",
+            file=sys.stderr
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument("--concurrency", type=int, default=settings.batch_concurrency)
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            asyncio.run(run(args.input, output, args.concurrency))
+    else:
+        asyncio.run(run(args.input, sys.stdout, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark embedding dimensions and storage precision on a local index.
+
+Chunks a PDF, embeds chunks and questions once at the model's native size,
+then for every (dimensions, precision) pair reports:
+
+- recall@k against the full-size float32 ranking
+- search latency per query
+- bytes per chunk in the local index and in a pgvector column
+
+Shortened vectors are simulated by truncating and re-normalizing the native
+ones, which is what the API's `dimensions` parameter returns for
+text-embedding-3 models.
+
+    python -m app.cli.embedding_benchmark --pdf Wilmer.pdf --questions preguntas.txt
+"""
+
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+from app.config import settings
+from app.db.supabase_client import create_embeddings
+from app.services.chunking import StructuredChunker
+from app.services.document_service import document_service
+from app.services.vector_index import LocalVectorIndex, reduce_dimensions, PRECISIONS
+
+
+DEFAULT_QUESTIONS = [
+    "¿Quién es Wilmer Gálvez?",
+    "¿Qué alianza respalda su candidatura?",
+    "¿Qué significa sin cola de paja?",
+    "¿Qué propone contra la corrupción?",
+    "¿Tiene vínculos con la FEJUVE o la UPEA?",
+    "¿Cómo responde a la guerra sucia?",
+    "¿Cuál es la ideología de LIBRE?",
+    "¿Qué colores usa la campaña?",
+]
+
+
+def load_questions(path: str | None) -> list[str]:
+    """Read one question per non-empty line, or use the default set."""
+    if not path:
+        return DEFAULT_QUESTIONS
+    return [line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def time_search(index: LocalVectorIndex, queries: np.ndarray, k: int, repeats: int) -> float:
+    """Median search latency per query in milliseconds."""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index.search(query, k)
+        timings.append((time.perf_counter() - start) / repeats)
+    return float(np.median(timings) * 1000)
+
+
+def run_benchmark(
+    chunk_vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    k: int,
+    dimensions: list[int],
+    precisions: list[str],
+    repeats: int
+) -> list[dict]:
+    """
+    Evaluate every (dimensions, precision) pair against the full-size ranking.
+
+    Args:
+        chunk_vectors: Native-size chunk embeddings, shape (n, dims)
+        query_vectors: Native-size question embeddings, shape (q, dims)
+        k: Results per query
+        dimensions: Dimension sizes to test
+        precisions: Storage precisions to test
+        repeats: Searches per query when timing
+
+    Returns:
+        One result dict per configuration
+    """
+    baseline = LocalVectorIndex("float32")
+    baseline.add(chunk_vectors)
+    truth = [set(baseline.search(query, k)[0].tolist()) for query in query_vectors]
+
+    results = []
+    for dims in dimensions:
+        chunks = reduce_dimensions(chunk_vectors, dims)
+        queries = reduce_dimensions(query_vectors, dims)
+        for precision in precisions:
+            index = LocalVectorIndex(precision)
+            index.add(chunks)
+            recall = np.mean([
+                len(truth[i] & set(index.search(query, k)[0].tolist())) / max(1, len(truth[i]))
+                for i, query in enumerate(queries)
+            ])
+            results.append({
+                "dimensions": chunks.shape[1],
+                "precision": precision,
+                f"recall@{k}": float(recall),
+                "latency_ms": time_search(index, queries, k, repeats),
+                "bytes_per_chunk": index.nbytes / len(index),
+                # pgvector stores float32 components plus an 8-byte header
+                "pgvector_bytes_per_row": 4 * chunks.shape[1] + 8,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default="Wilmer.pdf", help="PDF to chunk and embed")
+    parser.add_argument("--questions", help="Text file with one question per line")
+    parser.add_argument("--k", type=int, default=settings.similarity_top_k)
+    parser.add_argument("--chunk-tokens", type=int, default=settings.chunk_size_tokens)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 1024, 1536])
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument("--repeats", type=int, default=200, help="Searches per query when timing")
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as file:
+        pages = document_service.extract_text_from_pdf(file, Path(args.pdf).name)
+    chunks = StructuredChunker(chunk_tokens=args.chunk_tokens).split_documents(pages)
+    questions = load_questions(args.questions)
+    print(f"{len(chunks)} chunks, {len(questions)} preguntas, k={args.k}")
+
+    # One embeddings call per set, at the model's native size
+    native = create_embeddings(None)
+    chunk_vectors = np.array(native.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    query_vectors = np.array(native.embed_documents(questions), dtype=np.float32)
+
+    results = run_benchmark(chunk_vectors, query_vectors, args.k, args.dimensions, args.precisions, args.repeats)
+
+    recall_key = f"recall@{args.k}"
+    print(f"\n{'dims':>6} {'precisión':>10} {recall_key:>10} {'ms/query':>10} {'bytes/chunk':>12} {'pgvector B':>11}")
+    for row in results:
+        print(
+            f"{row['dimensions']:>6} {row['precision']:>10} {row[recall_key]:>10.3f} "
+            f"{row['latency_ms']:>10.4f} {row['bytes_per_chunk']:>12.0f} {row['pgvector_bytes_per_row']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Apply the knowledge base schema migrations (app/db/migrations).
+
+Needs a direct Postgres connection in DATABASE_URL (Supabase: Project
+Settings > Database > Connection string), or --database-url:
+
+    python -m app.cli.migrate --status          # applied / pending migrations
+    python -m app.cli.migrate                   # apply pending migrations
+    python -m app.cli.migrate --print           # print pending SQL (for the SQL editor)
+    python -m app.cli.migrate --rebuild-index   # recreate HNSW with current HNSW_M/HNSW_EF_CONSTRUCTION
+    python -m app.cli.migrate --explain         # show whether similarity search uses the index
+"""
+
+import argparse
+from app.db.schema import (
+    load_migrations,
+    connect,
+    applied_migrations,
+    apply_migrations,
+    hnsw_index_sql,
+    rebuild_hnsw_index,
+    explain_similarity_query,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Postgres connection string (defaults to DATABASE_URL)")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations")
+    parser.add_argument("--print", dest="print_sql", action="store_true", help="Print SQL instead of running it")
+    parser.add_argument("--reapply", nargs="+", default=[], metavar="VERSION", help="Run these migrations again")
+    parser.add_argument("--rebuild-index", action="store_true", help="Drop and recreate the HNSW index")
+    parser.add_argument("--explain", action="store_true", help="EXPLAIN the similarity query")
+    args = parser.parse_args()
+
+    migrations = load_migrations()
+
+    if args.print_sql and not args.database_url:
+        # No connection needed: print everything that would be run
+        for migration in migrations:
+            print(f"-- {migration.version}_{migration.name}\n{migration.sql}")
+        if args.rebuild_index:
+            print(hnsw_index_sql())
+        return
+
+    conn = connect(args.database_url)
+    try:
+        applied = applied_migrations(conn)
+
+        if args.status:
+            for migration in migrations:
+                if migration.version not in applied:
+                    state = "pendiente"
+                elif applied[migration.version] != migration.checksum:
+                    state = "aplicada (cambió)"
+                else:
+                    state = "aplicada"
+                print(f"{migration.version}_{migration.name}: {state}")
+            return
+
+        if args.print_sql:
+            for migration in migrations:
+                if migration.version not in applied or migration.version in args.reapply:
+                    print(f"-- {migration.version}_{migration.name}\n{migration.sql}")
+            if args.rebuild_index:
+                print(hnsw_index_sql())
+            return
+
+        if not args.explain:
+            for migration in apply_migrations(conn, migrations, reapply=frozenset(args.reapply)):
+                print(f"Aplicada: {migration.version}_{migration.name}")
+            if args.rebuild_index:
+                rebuild_hnsw_index(conn)
+                print("Índice HNSW recreado")
+
+        uses_index, plan = explain_similarity_query(conn)
+        print(f"\n{plan}\n")
+        print("La búsqueda usa el índice HNSW" if uses_index else "La búsqueda NO usa el índice HNSW")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Pre-warm and inspect the extracted PDF text cache.
+
+    python -m app.cli.pdf_cache Wilmer.pdf otros/*.pdf   # extract and cache
+    python -m app.cli.pdf_cache --stats                  # entries and size
+    python -m app.cli.pdf_cache --evict                  # enforce PDF_CACHE_MAX_BYTES now
+
+Useful before a re-ingest or a parameter sweep, and in deploy images so the
+first /ingest of a known PDF doesn't pay for extraction.
+"""
+
+import argparse
+import time
+from pathlib import Path
+from pypdf import PdfReader
+from app.services.pdf_cache import pdf_text_cache
+
+
+def prewarm(path: Path) -> None:
+    """Extract a PDF's page texts into the cache unless already there."""
+    data = path.read_bytes()
+    key = pdf_text_cache.make_key(data)
+    if pdf_text_cache.get(key) is not None:
+        print(f"  {path.name}: ya en caché")
+        return
+
+    start = time.perf_counter()
+    pages = [page.extract_text() for page in PdfReader(path).pages]
+    pdf_text_cache.put(key, pages)
+    print(f"  {path.name}: {len(pages)} páginas extraídas en {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDF files to extract and cache")
+    parser.add_argument("--stats", action="store_true", help="Print cache entries and size")
+    parser.add_argument("--evict", action="store_true", help="Evict entries over the size limit")
+    args = parser.parse_args()
+
+    for pdf in args.pdfs:
+        prewarm(Path(pdf))
+
+    if args.evict:
+        print(f"Eliminadas: {pdf_text_cache.evict()} entradas")
+
+    if args.stats or not args.pdfs:
+        entries, size = pdf_text_cache.size()
+        print(
+            f"{pdf_text_cache.directory}: {entries} PDFs, {size / 1024:.1f} KB "
+            f"de {pdf_text_cache.max_bytes / 1024 / 1024:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
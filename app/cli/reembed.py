@@ -0,0 +1,114 @@
+"""
+Re-embed every chunk in wilmer_documents with the current embedding settings.
+
+Run after changing OPENAI_EMBEDDING_MODEL or OPENAI_EMBEDDING_DIMENSIONS:
+
+    python -m app.cli.reembed --print-sql   # column/index changes to apply first
+    python -m app.cli.reembed               # re-embed all rows in batches
+
+Chunk texts are read back from Supabase, so the PDF doesn't need to be
+re-uploaded and chunk ids stay the same.
+"""
+
+import argparse
+from app.config import settings
+from app.db.supabase_client import supabase_client, embeddings
+from app.db.shared_state import bump_kb_version
+from app.db.schema import target_dimensions
+from app.services.rate_limiter import rate_limiter, estimate_tokens
+
+
+TABLE_NAME = "wilmer_documents"
+PAGE_SIZE = 1000
+
+
+def column_migration_sql(dimensions: int) -> str:
+    """
+    SQL that resizes the embedding column; existing vectors are discarded
+    (they are rewritten by this command right after).
+
+    Args:
+        dimensions: New vector size
+
+    Returns:
+        SQL statements to run in the Supabase SQL editor
+    """
+    return (
+        f"ALTER TABLE {TABLE_NAME} ALTER COLUMN embedding DROP NOT NULL;\n"
+        f"ALTER TABLE {TABLE_NAME} ALTER COLUMN embedding TYPE vector({dimensions}) USING NULL;\n"
+        f"-- then recreate the HNSW index and match_wilmer_documents for vector({dimensions}):\n"
+        f"-- python -m app.cli.migrate --rebuild-index --reapply 0003 0004"
+    )
+
+
+def fetch_rows() -> list[dict]:
+    """Read id, content and metadata of every stored chunk."""
+    rows = []
+    start = 0
+    while True:
+        response = (
+            supabase_client.table(TABLE_NAME)
+            .select("id, content, metadata")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        rows.extend(response.data or [])
+        if not response.data or len(response.data) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def reembed(batch_size: int, dry_run: bool = False) -> int:
+    """
+    Re-embed all stored chunks with the current embeddings configuration.
+
+    Args:
+        batch_size: Chunks per embeddings request / upsert
+        dry_run: Only count the rows that would be re-embedded
+
+    Returns:
+        Number of chunks re-embedded
+    """
+    rows = fetch_rows()
+    print(f"{len(rows)} chunks en {TABLE_NAME}; dimensiones destino: {target_dimensions()}")
+    if dry_run:
+        return 0
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        texts = [row["content"] for row in batch]
+
+        rate_limiter.acquire_sync(
+            settings.openai_embedding_model,
+            sum(estimate_tokens(text) for text in texts)
+        )
+        vectors = embeddings.embed_documents(texts)
+
+        supabase_client.table(TABLE_NAME).upsert([
+            {"id": row["id"], "content": row["content"], "metadata": row["metadata"], "embedding": vector}
+            for row, vector in zip(batch, vectors)
+        ]).execute()
+        print(f"  {min(start + batch_size, len(rows))}/{len(rows)}")
+
+    # Cached answers were computed against the old vectors
+    bump_kb_version()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks per embeddings request")
+    parser.add_argument("--dry-run", action="store_true", help="Only count rows")
+    parser.add_argument("--print-sql", action="store_true", help="Print the column migration SQL and exit")
+    args = parser.parse_args()
+
+    if args.print_sql:
+        print(column_migration_sql(target_dimensions()))
+        return
+
+    count = reembed(args.batch_size, dry_run=args.dry_run)
+    print(f"Re-embebidos: {count} chunks")
+
+
+if __name__ == "__main__":
+    main()
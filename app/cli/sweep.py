@@ -0,0 +1,244 @@
+"""
+Sweep chunking and retrieval parameters against a labelled question set.
+
+Chunks a PDF under every combination of strategy / chunk size / overlap,
+embeds the chunks into an in-memory index (nothing is written to Supabase)
+and, for every top-k, reports:
+
+- recall@k: share of each question's expected passages found in the top k
+- MRR: reciprocal rank of the first chunk containing an expected passage
+- context tokens per query sent to the LLM
+- chunk count and index size
+- retrieval latency per query (local index, excluding the query embedding)
+
+Labelled questions are JSONL, one {"question", "expected": [...]} per line,
+where "expected" are short passages of the PDF that answer the question
+(matched ignoring case, accents and punctuation). Embeddings are cached on
+disk by text hash, so re-running with new settings only embeds new chunks:
+
+    python -m app.cli.sweep --pdf Wilmer.pdf --questions preguntas_etiquetadas.jsonl
+    python -m app.cli.sweep --strategies structured --sizes-tokens 200 350 500 --top-k 2 3 4
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import time
+from pathlib import Path
+import numpy as np
+from app.config import settings
+from app.db.supabase_client import create_embeddings
+from app.services.chunking import count_tokens
+from app.services.coalescing_service import normalize_message
+from app.services.document_service import document_service, create_text_splitter
+from app.services.rate_limiter import rate_limiter, estimate_tokens
+from app.services.vector_index import LocalVectorIndex, PRECISIONS
+
+
+DEFAULT_LABELLED = [
+    {"question": "¿A qué cargo se postula Wilmer Gálvez?", "expected": ["candidato oficial a la Alcaldía de El Alto"]},
+    {"question": "¿Qué significa sin cola de paja?", "expected": ["no tiene antecedentes de corrupción"]},
+    {"question": "¿Qué alianza respalda su candidatura?", "expected": ["alianza Libertad y República"]},
+    {"question": "¿Quién respalda a LIBRE a nivel nacional?", "expected": ["Jorge \"Tuto\" Quiroga"]},
+    {"question": "¿Cuál es la ideología de LIBRE?", "expected": ["conservadora liberal", "corazón a la izquierda"]},
+    {"question": "¿Qué colores usa la campaña?", "expected": ["rojo intenso y el azul oscuro"]},
+    {"question": "¿Tiene vínculos con la FEJUVE o la UPEA?", "expected": ["no existen registros públicos verificables"]},
+    {"question": "¿Perteneció antes al MAS?", "expected": ["no existen registros que lo acusen"]},
+    {"question": "¿Cómo responde a la guerra sucia?", "expected": ["no entrar en el debate de ataques personales"]},
+]
+
+# Chunks per embeddings request when filling the cache
+EMBED_BATCH_SIZE = 100
+
+
+def load_labelled(path: str | None) -> list[dict]:
+    """Read labelled questions from JSONL, or use the default set."""
+    if not path:
+        return DEFAULT_LABELLED
+    questions = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            questions.append({"question": entry["question"], "expected": list(entry["expected"])})
+    return questions
+
+
+class EmbeddingCache:
+    """Embeddings stored on disk, keyed by the hash of model, dimensions and text."""
+
+    def __init__(self, path: Path, dimensions: int | None):
+        self.path = path
+        self.dimensions = dimensions
+        self.client = create_embeddings(dimensions)
+        self.vectors: dict[str, np.ndarray] = {}
+        if path.exists():
+            with np.load(path) as stored:
+                self.vectors = {key: stored[key] for key in stored.files}
+
+    def _key(self, text: str) -> str:
+        raw = f"{settings.openai_embedding_model}:{self.dimensions}:{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """
+        Get embeddings for texts, calling the API only for unseen ones.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Array of shape (len(texts), dims)
+        """
+        keys = [self._key(text) for text in texts]
+        missing = list({key: text for key, text in zip(keys, texts) if key not in self.vectors}.items())
+
+        for start in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[start:start + EMBED_BATCH_SIZE]
+            rate_limiter.acquire_sync(
+                settings.openai_embedding_model,
+                sum(estimate_tokens(text) for _, text in batch)
+            )
+            vectors = self.client.embed_documents([text for _, text in batch])
+            for (key, _), vector in zip(batch, vectors):
+                self.vectors[key] = np.asarray(vector, dtype=np.float32)
+
+        if missing:
+            self.save()
+        return np.stack([self.vectors[key] for key in keys])
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as file:
+            np.savez(file, **self.vectors)
+
+
+def build_grid(args: argparse.Namespace) -> list[tuple[str, int, int]]:
+    """List (strategy, size, overlap) configurations; overlaps not smaller than the size are skipped."""
+    grid = []
+    for strategy in args.strategies:
+        if strategy == "structured":
+            sizes, overlaps = args.sizes_tokens, args.overlaps_tokens
+        else:
+            sizes, overlaps = args.sizes_chars, args.overlaps_chars
+        grid.extend(
+            (strategy, size, overlap)
+            for size, overlap in itertools.product(sizes, overlaps)
+            if overlap < size
+        )
+    return grid
+
+
+def evaluate(
+    chunk_texts: list[str],
+    chunk_vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    labelled: list[dict],
+    top_ks: list[int],
+    precision: str,
+    repeats: int
+) -> list[dict]:
+    """
+    Score one chunking configuration for every top-k.
+
+    Args:
+        chunk_texts: Chunk contents
+        chunk_vectors: Chunk embeddings, shape (n, dims)
+        query_vectors: Question embeddings, shape (q, dims)
+        labelled: Labelled questions (same order as query_vectors)
+        top_ks: Values of k to evaluate
+        precision: Storage precision of the local index
+        repeats: Searches per query when timing
+
+    Returns:
+        One metrics dict per k
+    """
+    index = LocalVectorIndex(precision)
+    index.add(chunk_vectors)
+    normalized_chunks = [normalize_message(text) for text in chunk_texts]
+    chunk_tokens = [count_tokens(text) for text in chunk_texts]
+
+    rows = []
+    for k in top_ks:
+        recalls, reciprocal_ranks, context_tokens, timings = [], [], [], []
+        for query, entry in zip(query_vectors, labelled):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                top, _ = index.search(query, k)
+            timings.append((time.perf_counter() - start) / repeats)
+
+            expected = [normalize_message(passage) for passage in entry["expected"]]
+            found = {passage for passage in expected for i in top if passage in normalized_chunks[i]}
+            recalls.append(len(found) / len(expected))
+            ranks = [rank for rank, i in enumerate(top, 1) if any(p in normalized_chunks[i] for p in expected)]
+            reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+            context_tokens.append(sum(chunk_tokens[i] for i in top))
+
+        rows.append({
+            "k": k,
+            "recall": float(np.mean(recalls)),
+            "mrr": float(np.mean(reciprocal_ranks)),
+            "context_tokens": float(np.mean(context_tokens)),
+            "chunks": len(chunk_texts),
+            "index_bytes": index.nbytes,
+            "latency_ms": float(np.median(timings) * 1000),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default="Wilmer.pdf", help="PDF to chunk and embed")
+    parser.add_argument("--questions", help="Labelled questions (JSONL with question/expected)")
+    parser.add_argument("--strategies", nargs="+", choices=["structured", "recursive"], default=["structured", "recursive"])
+    parser.add_argument("--sizes-tokens", type=int, nargs="+", default=[200, 350, 500], help="Structured chunk sizes")
+    parser.add_argument("--overlaps-tokens", type=int, nargs="+", default=[0, 50])
+    parser.add_argument("--sizes-chars", type=int, nargs="+", default=[600, 1000, 1500], help="Recursive chunk sizes")
+    parser.add_argument("--overlaps-chars", type=int, nargs="+", default=[0, 200])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[2, 3, 4, 6])
+    parser.add_argument("--dimensions", type=int, default=settings.openai_embedding_dimensions)
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32")
+    parser.add_argument("--repeats", type=int, default=50, help="Searches per query when timing")
+    parser.add_argument("--cache-dir", default=".cache/embeddings", help="Where embeddings are cached")
+    parser.add_argument("--output", help="Also write every result row to this JSONL file")
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as file:
+        pages = document_service.extract_text_from_pdf(file, Path(args.pdf).name)
+    labelled = load_labelled(args.questions)
+
+    cache_name = f"{settings.openai_embedding_model}-{args.dimensions or 'native'}.npz"
+    cache = EmbeddingCache(Path(args.cache_dir) / cache_name, args.dimensions)
+    query_vectors = cache.embed([entry["question"] for entry in labelled])
+
+    results = []
+    for strategy, size, overlap in build_grid(args):
+        chunks = create_text_splitter(strategy, size, overlap).split_documents(pages)
+        chunk_texts = [chunk.page_content for chunk in chunks]
+        rows = evaluate(
+            chunk_texts, cache.embed(chunk_texts), query_vectors,
+            labelled, args.top_k, args.precision, args.repeats
+        )
+        results.extend({"strategy": strategy, "size": size, "overlap": overlap, **row} for row in rows)
+
+    print(f"{len(pages)} páginas, {len(labelled)} preguntas etiquetadas\n")
+    print(
+        f"{'estrategia':>10} {'tamaño':>7} {'overlap':>7} {'k':>3} {'recall':>7} {'MRR':>6} "
+        f"{'tokens ctx':>10} {'chunks':>6} {'índice KB':>9} {'ms/query':>9}"
+    )
+    # Best configurations first: highest recall, then smallest prompt
+    for row in sorted(results, key=lambda r: (-r["recall"], r["context_tokens"])):
+        print(
+            f"{row['strategy']:>10} {row['size']:>7} {row['overlap']:>7} {row['k']:>3} "
+            f"{row['recall']:>7.3f} {row['mrr']:>6.3f} {row['context_tokens']:>10.0f} "
+            f"{row['chunks']:>6} {row['index_bytes'] / 1024:>9.1f} {row['latency_ms']:>9.4f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            for row in results:
+                file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
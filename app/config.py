@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,17 +12,103 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str
     openai_embedding_model: str = "text-embedding-3-small"
+    # Shortened embedding size (e.g. 512); None stores the native 1536 dims.
+    # Must match the wilmer_documents.embedding column: re-embed after changing it.
+    openai_embedding_dimensions: Optional[int] = None
     
     # Supabase Configuration
     supabase_url: str
     supabase_service_role_key: str
     
     # Document Processing
+    # "structured": token-sized chunks that follow headings and lists
+    # "recursive": fixed character windows (chunk_size/chunk_overlap)
+    chunking_strategy: str = "structured"
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    chunk_size_tokens: int = 350
+    chunk_overlap_tokens: int = 0
+    
+    # Database Schema (direct Postgres connection, e.g. Supabase's connection string,
+    # for migrations and the startup query plan check; None disables both)
+    database_url: Optional[str] = None
+    schema_check_on_startup: bool = True
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40  # Must be >= match_count
+    match_count: int = 20  # Rows match_wilmer_documents returns by default
+    
+    # PDF Text Cache (extracted page text keyed by file hash and pypdf version)
+    pdf_cache_enabled: bool = True
+    pdf_cache_dir: str = ".cache/pdf_text"
+    pdf_cache_max_bytes: int = 100_000_000
     
     # Vector Search
     similarity_top_k: int = 4
+    # MMR reranking: over-fetch mmr_fetch_k candidates (<= match_count) with their
+    # embeddings and pick similarity_top_k diverse ones; lambda 1 = relevance only
+    mmr_enabled: bool = True
+    mmr_fetch_k: int = 12
+    mmr_lambda: float = 0.6
+    mmr_latency_budget_ms: float = 5.0
+    # Query vectors kept in memory (repeated and batch-prewarmed questions)
+    query_embedding_cache_size: int = 2048
+    
+    # Request Coalescing
+    coalesce_enabled: bool = True
+    coalesce_wait_timeout: float = 30.0
+    answer_cache_ttl: float = 600.0
+    
+    # Deadlines: end-to-end time budget per /api/chat turn. When less than the
+    # reserve is left, the run is stopped and a degraded answer is sent instead
+    # (retrieved passages in a persona template, no LLM call)
+    chat_deadline_seconds: float = 25.0
+    chat_deadline_reserve_seconds: float = 3.0
+    degraded_max_passages: int = 3
+    degraded_passage_chars: int = 400
+    
+    # Streaming (Vercel AI SDK data stream): text is coalesced per time/size window
+    stream_flush_interval: float = 0.05
+    stream_max_buffer_chars: int = 256
+    stream_tool_events: bool = True
+    
+    # Shared State (sqlite:///path for one host, redis://... for a fleet)
+    shared_state_url: str = "sqlite:///.cache/shared_state.sqlite3"
+    shared_state_prefix: str = "wilmer:"
+    # Number of workers/pods sharing the provider rate limits
+    worker_count: int = 1
+    
+    # Rate Limiting (client-side, per model; overrides map model -> (requests/min, tokens/min))
+    rate_limit_enabled: bool = True
+    rate_limit_requests_per_minute: int = 1000
+    rate_limit_tokens_per_minute: int = 250000
+    rate_limit_overrides: dict[str, tuple[int, int]] = {
+        "text-embedding-3-small": (3000, 1000000),
+    }
+    rate_limit_max_queue: int = 50
+    rate_limit_max_wait: float = 10.0
+    llm_output_tokens_estimate: int = 512
+    rag_llm_calls_estimate: int = 2  # Groq requests charged per RAG turn (tool selection + answer)
+    
+    # Model Routing (chit-chat turns go to a small model without tools)
+    router_enabled: bool = True
+    router_small_model: str = "llama-3.1-8b-instant"
+    router_small_temperature: float = 0.7
+    router_chitchat_max_words: int = 6
+    
+    # Batch Chat (/api/chat/batch and app.cli.batch_chat)
+    batch_concurrency: int = 4
+    batch_prewarm_embeddings: bool = True  # Embed RAG questions up front (check the query cache hit rate)
+    batch_embedding_size: int = 256  # Questions per embeddings call when prewarming
+    batch_max_items: int = 5000
+    
+    # Pricing in USD per million (input, output) tokens, for per-route cost reporting
+    llm_prices: dict[str, tuple[float, float]] = {
+        "openai/gpt-oss-20b": (0.075, 0.30),
+        "llama-3.1-8b-instant": (0.05, 0.08),
+    }
+    # Cached prompt tokens are billed at this fraction of the input price
+    llm_cached_input_price_ratio: float = 0.5
     
     model_config = SettingsConfigDict(
         env_file=".env",
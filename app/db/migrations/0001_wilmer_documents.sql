@@ -0,0 +1,21 @@
+-- Knowledge base table used by SupabaseVectorStore (app/db/supabase_client.py).
+-- Idempotent, so it also adopts a table created earlier by hand.
+
+create extension if not exists vector;
+
+create table if not exists wilmer_documents (
+    id uuid primary key default gen_random_uuid(),
+    content text not null,
+    metadata jsonb not null default '{}'::jsonb,
+    embedding vector(${embedding_dimensions})
+);
+
+-- Metadata fields used as filters, as real columns so they can be indexed
+alter table wilmer_documents
+    add column if not exists filename text generated always as (metadata->>'filename') stored;
+alter table wilmer_documents
+    add column if not exists page integer generated always as ((metadata->>'page')::integer) stored;
+alter table wilmer_documents
+    add column if not exists section text generated always as (metadata->>'section') stored;
+
+create index if not exists wilmer_documents_filename_idx on wilmer_documents (filename);
@@ -0,0 +1,8 @@
+-- Approximate nearest-neighbour index for cosine distance (<=>).
+-- m / ef_construction come from HNSW_M / HNSW_EF_CONSTRUCTION; to change them
+-- on an existing database run: python -m app.cli.migrate --rebuild-index
+
+create index if not exists wilmer_documents_embedding_hnsw_idx
+    on wilmer_documents
+    using hnsw (embedding vector_cosine_ops)
+    with (m = ${hnsw_m}, ef_construction = ${hnsw_ef_construction});
@@ -0,0 +1,44 @@
+-- Similarity search called by SupabaseVectorStore through the RPC endpoint.
+--
+-- SupabaseVectorStore sends only query_embedding and filter and applies k
+-- with a PostgREST limit on top, so match_count has a default: without an
+-- ORDER BY ... LIMIT inside the function the HNSW index can't be used.
+-- ef_search (candidates visited by HNSW) must be >= match_count.
+-- The embedding is returned for client-side reranking (MMR).
+
+drop function if exists match_wilmer_documents(vector, jsonb);
+drop function if exists match_wilmer_documents(vector, jsonb, integer, integer);
+
+create function match_wilmer_documents(
+    query_embedding vector(${embedding_dimensions}),
+    filter jsonb default '{}'::jsonb,
+    match_count integer default ${match_count},
+    ef_search integer default ${hnsw_ef_search}
+)
+returns table (
+    id uuid,
+    content text,
+    metadata jsonb,
+    embedding vector(${embedding_dimensions}),
+    similarity double precision
+)
+language plpgsql
+as $$
+begin
+    perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+
+    return query
+    select
+        d.id,
+        d.content,
+        d.metadata,
+        d.embedding,
+        1 - (d.embedding <=> query_embedding) as similarity
+    from wilmer_documents d
+    where (filter->>'filename' is null or d.filename = filter->>'filename')
+      and (filter->>'section' is null or d.section = filter->>'section')
+      and d.metadata @> (filter - 'filename' - 'section')
+    order by d.embedding <=> query_embedding
+    limit match_count;
+end;
+$$;
@@ -0,0 +1,48 @@
+-- Filtered similarity search that still returns match_count rows.
+--
+-- HNSW visits ef_search candidates and the filter is applied afterwards, so a
+-- selective filter (one file, one page) used to return fewer rows than asked.
+-- hnsw.iterative_scan (pgvector >= 0.8, shipped by Supabase and by the
+-- pgvector/pgvector:pg16 image) keeps scanning the index until enough rows
+-- pass the filter, up to hnsw.max_scan_tuples. relaxed_order may return the
+-- candidates slightly out of order, so they are sorted again by distance.
+
+create or replace function match_wilmer_documents(
+    query_embedding vector(${embedding_dimensions}),
+    filter jsonb default '{}'::jsonb,
+    match_count integer default ${match_count},
+    ef_search integer default ${hnsw_ef_search}
+)
+returns table (
+    id uuid,
+    content text,
+    metadata jsonb,
+    embedding vector(${embedding_dimensions}),
+    similarity double precision
+)
+language plpgsql
+as $$
+begin
+    perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+    perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+
+    return query
+    with candidates as materialized (
+        select
+            d.id,
+            d.content,
+            d.metadata,
+            d.embedding,
+            d.embedding <=> query_embedding as distance
+        from wilmer_documents d
+        where (filter->>'filename' is null or d.filename = filter->>'filename')
+          and (filter->>'section' is null or d.section = filter->>'section')
+          and d.metadata @> (filter - 'filename' - 'section')
+        order by d.embedding <=> query_embedding
+        limit match_count
+    )
+    select c.id, c.content, c.metadata, c.embedding, 1 - c.distance as similarity
+    from candidates c
+    order by c.distance;
+end;
+$$;
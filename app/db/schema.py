@@ -0,0 +1,226 @@
+"""
+Versioned schema for the knowledge base (wilmer_documents and match_wilmer_documents).
+
+Migrations are the numbered files in app/db/migrations. They are applied in
+order, each in its own transaction, and recorded in schema_migrations with a
+checksum. `${name}` placeholders are filled from settings (embedding size,
+HNSW parameters), so one set of files serves every configuration.
+
+A direct Postgres connection (DATABASE_URL) is needed; psycopg2 is already
+installed as a dependency of vecs.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+PLACEHOLDER_PATTERN = re.compile(r"\$\{(\w+)\}")
+HNSW_INDEX_NAME = "wilmer_documents_embedding_hnsw_idx"
+
+
+@dataclass
+class Migration:
+    """A rendered migration file."""
+    version: str
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+def target_dimensions() -> int:
+    """Get the embedding size produced by the current settings."""
+    if settings.openai_embedding_dimensions:
+        return settings.openai_embedding_dimensions
+    return 3072 if settings.openai_embedding_model.endswith("-large") else 1536
+
+
+def migration_params() -> dict[str, int]:
+    """Values for the ${name} placeholders of the migration files."""
+    return {
+        "embedding_dimensions": target_dimensions(),
+        "hnsw_m": settings.hnsw_m,
+        "hnsw_ef_construction": settings.hnsw_ef_construction,
+        "hnsw_ef_search": settings.hnsw_ef_search,
+        "match_count": settings.match_count,
+    }
+
+
+def render(sql: str, params: dict[str, int]) -> str:
+    """
+    Fill ${name} placeholders.
+
+    Raises:
+        KeyError: If a placeholder has no value
+    """
+    return PLACEHOLDER_PATTERN.sub(lambda match: str(int(params[match.group(1)])), sql)
+
+
+def load_migrations(params: Optional[dict[str, int]] = None) -> list[Migration]:
+    """
+    Read and render every migration file, in version order.
+
+    Args:
+        params: Placeholder values (defaults to migration_params())
+
+    Returns:
+        List of migrations
+    """
+    params = params or migration_params()
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            raise ValueError(f"Nombre de migración inválido: {path.name} (usa NNNN_nombre.sql)")
+        migrations.append(Migration(match.group(1), match.group(2), render(path.read_text(encoding="utf-8"), params)))
+    return migrations
+
+
+def connect(database_url: Optional[str] = None):
+    """
+    Open a Postgres connection.
+
+    Raises:
+        RuntimeError: If no database URL is configured
+    """
+    import psycopg2
+
+    url = database_url or settings.database_url
+    if not url:
+        raise RuntimeError("DATABASE_URL no está configurado")
+    return psycopg2.connect(url)
+
+
+def ensure_migrations_table(conn) -> None:
+    """Create the table that records applied migrations."""
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version text PRIMARY KEY,"
+            " name text NOT NULL,"
+            " checksum text NOT NULL,"
+            " applied_at timestamptz NOT NULL DEFAULT now())"
+        )
+
+
+def applied_migrations(conn) -> dict[str, str]:
+    """Get applied migration versions mapped to their checksums (empty if none yet)."""
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return {}
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        return dict(cur.fetchall())
+
+
+def apply_migrations(conn, migrations: list[Migration], reapply: frozenset[str] = frozenset()) -> list[Migration]:
+    """
+    Apply pending migrations, each in its own transaction.
+
+    Applied migrations whose rendered SQL changed since (edited file or new
+    settings) are reported but not re-run unless their version is listed in
+    reapply (only for idempotent ones, e.g. 0003 and 0004 after an embedding size change).
+
+    Args:
+        conn: Open psycopg2 connection
+        migrations: Migrations to consider, in order
+        reapply: Versions to run again even if already applied
+
+    Returns:
+        Migrations that were applied
+    """
+    ensure_migrations_table(conn)
+    applied = applied_migrations(conn)
+    newly_applied = []
+    for migration in migrations:
+        if migration.version in applied and migration.version not in reapply:
+            if applied[migration.version] != migration.checksum:
+                print(f"Aviso: la migración {migration.version}_{migration.name} cambió desde que se aplicó")
+            continue
+        with conn, conn.cursor() as cur:
+            cur.execute(migration.sql)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s) "
+                "ON CONFLICT (version) DO UPDATE SET checksum = EXCLUDED.checksum, applied_at = now()",
+                (migration.version, migration.name, migration.checksum)
+            )
+        newly_applied.append(migration)
+    return newly_applied
+
+
+def hnsw_index_sql() -> str:
+    """SQL that recreates the HNSW index with the current HNSW_M / HNSW_EF_CONSTRUCTION."""
+    return (
+        f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME};\n"
+        f"CREATE INDEX {HNSW_INDEX_NAME} ON wilmer_documents "
+        f"USING hnsw (embedding vector_cosine_ops) "
+        f"WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)});"
+    )
+
+
+def rebuild_hnsw_index(conn) -> None:
+    """Recreate the HNSW index (needed after changing m/ef_construction or the embedding size)."""
+    with conn, conn.cursor() as cur:
+        cur.execute(hnsw_index_sql())
+
+
+def explain_similarity_query(conn) -> tuple[bool, str]:
+    """
+    EXPLAIN the query match_wilmer_documents runs.
+
+    The function body is opaque to EXPLAIN, so its inner ORDER BY ... LIMIT
+    is explained directly with a dummy query vector. On a handful of rows the
+    planner may still choose a sequential scan because it is cheaper.
+
+    Args:
+        conn: Open psycopg2 connection
+
+    Returns:
+        Tuple of (uses the HNSW index, plan text)
+    """
+    dimensions = target_dimensions()
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            "EXPLAIN SELECT id FROM wilmer_documents "
+            "ORDER BY embedding <=> array_fill(0.01, ARRAY[%s])::vector LIMIT %s",
+            (dimensions, settings.match_count)
+        )
+        plan = "\n".join(row[0] for row in cur.fetchall())
+    return HNSW_INDEX_NAME in plan, plan
+
+
+def check_query_plan() -> Optional[bool]:
+    """
+    Startup check: warn when similarity searches would scan the whole table.
+
+    Returns:
+        True/False for index use, or None when the check couldn't run
+    """
+    try:
+        conn = connect()
+    except Exception as e:
+        print(f"Error checking query plan: {e}")
+        return None
+
+    try:
+        applied = applied_migrations(conn)
+        pending = [m for m in load_migrations() if m.version not in applied]
+        if pending:
+            print(f"Aviso: migraciones pendientes: {', '.join(m.version for m in pending)} (python -m app.cli.migrate)")
+        uses_index, plan = explain_similarity_query(conn)
+        if not uses_index:
+            print(f"Aviso: la búsqueda por similitud no usa {HNSW_INDEX_NAME}:\n{plan}")
+        return uses_index
+    except Exception as e:
+        print(f"Error checking query plan: {e}")
+        return None
+    finally:
+        conn.close()
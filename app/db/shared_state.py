@@ -0,0 +1,238 @@
+"""
+Shared state for caches and signals that must be consistent across workers.
+
+Every uvicorn worker (or pod) keeps its own Python objects, so anything that
+has to be coordinated between them (answer caches, the knowledge base version,
+in-flight locks) lives in a shared key-value backend instead:
+
+- SQLite (default): a local file, shared by all workers on the same host
+- Redis: any Redis-protocol server, shared by the whole fleet
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Protocol
+from app.config import settings
+
+
+class SharedStateBackend(Protocol):
+    """Minimal key-value protocol implemented by every shared-state backend."""
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a value, or None if missing or expired."""
+        ...
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Set a value, optionally expiring after ttl seconds."""
+        ...
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value only if the key doesn't exist. Returns True if it was set."""
+        ...
+
+    def delete(self, key: str) -> None:
+        """Delete a key if it exists."""
+        ...
+
+    def incr(self, key: str) -> int:
+        """Atomically increment an integer counter and return the new value."""
+        ...
+
+
+class SQLiteStateBackend:
+    """
+    Shared state in a SQLite file (WAL mode), safe across processes on one host.
+
+    Expired rows are deleted when their key is read, at startup, and in bulk
+    every PURGE_INTERVAL writes, so one-off keys (answers to questions asked
+    once) don't make the file grow without bound.
+    """
+
+    PURGE_INTERVAL = 200
+
+    def __init__(self, path: str, prefix: str = ""):
+        self.path = path
+        self.prefix = prefix
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self.purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit with explicit transactions
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _expires_at(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl is not None else None
+
+    def _after_write(self) -> None:
+        if next(self._writes) % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete every expired row (of any prefix). Returns the number of rows deleted."""
+        cursor = self._connection().execute(
+            "DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),)
+        )
+        return cursor.rowcount
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM shared_state WHERE key = ?",
+            (self.prefix + key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (self.prefix + key, value, self._expires_at(ttl))
+        )
+        self._after_write()
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM shared_state WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (self.prefix + key, time.time())
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (self.prefix + key, value, self._expires_at(ttl))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write()
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._connection().execute(
+            "DELETE FROM shared_state WHERE key = ?", (self.prefix + key,)
+        )
+
+    def incr(self, key: str) -> int:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO shared_state (key, value, expires_at) VALUES (?, '1', NULL) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (self.prefix + key,)
+            )
+            value = conn.execute(
+                "SELECT value FROM shared_state WHERE key = ?", (self.prefix + key,)
+            ).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return int(value)
+
+
+class RedisStateBackend:
+    """Shared state in a Redis-protocol server (Redis, Valkey, KeyDB, ...)."""
+
+    def __init__(self, url: str, prefix: str = ""):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "El backend Redis requiere el paquete 'redis' (pip install redis)"
+            ) from e
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return int(ttl * 1000) if ttl is not None else None
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self.client.set(self.prefix + key, value, px=self._px(ttl))
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, value, px=self._px(ttl), nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+
+def create_shared_state(url: str, prefix: str = "") -> SharedStateBackend:
+    """
+    Create the shared-state backend for a URL.
+
+    Args:
+        url: "sqlite:///relative/path.sqlite3", "sqlite:////absolute/path.sqlite3"
+            or a redis:// / rediss:// / unix:// URL
+        prefix: Prefix added to every key (namespacing in shared servers)
+
+    Returns:
+        SharedStateBackend: Configured backend
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url[len("sqlite:///"):], prefix=prefix)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url, prefix=prefix)
+    raise ValueError(f"URL de estado compartido no soportada: {url}")
+
+
+# Initialize shared state
+shared_state: SharedStateBackend = create_shared_state(
+    settings.shared_state_url,
+    prefix=settings.shared_state_prefix
+)
+
+
+KB_VERSION_KEY = "kb:version"
+
+
+def get_kb_version() -> int:
+    """
+    Get the current knowledge base version, shared by all workers.
+
+    Returns:
+        int: Version number (0 if nothing was ingested yet)
+    """
+    return int(shared_state.get(KB_VERSION_KEY) or 0)
+
+
+def bump_kb_version() -> int:
+    """
+    Signal that the knowledge base changed, invalidating cached answers fleet-wide.
+
+    Returns:
+        int: The new version number
+    """
+    return shared_state.incr(KB_VERSION_KEY)
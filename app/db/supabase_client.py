@@ -1,7 +1,14 @@
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
 from supabase import create_client, Client
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import SupabaseVectorStore
 from app.config import settings
+from app.services.metrics import metrics
+from app.services.rate_limiter import rate_limiter, estimate_tokens
 
 
 # Initialize Supabase client
@@ -10,10 +17,97 @@ supabase_client: Client = create_client(
     supabase_key=settings.supabase_service_role_key
 )
 
-# Initialize OpenAI embeddings
-embeddings = OpenAIEmbeddings(
-    openai_api_key=settings.openai_api_key,
-    model=settings.openai_embedding_model
+
+def create_embeddings(dimensions: Optional[int] = None) -> OpenAIEmbeddings:
+    """
+    Create an OpenAI embeddings client.
+    
+    Args:
+        dimensions: Shortened output dimensions (text-embedding-3 models only);
+            None returns the model's native size
+    
+    Returns:
+        OpenAIEmbeddings: Configured embeddings client
+    """
+    return OpenAIEmbeddings(
+        openai_api_key=settings.openai_api_key,
+        model=settings.openai_embedding_model,
+        dimensions=dimensions
+    )
+
+
+class QueryCacheStats:
+    """Query-embedding cache lookups made while it is set in query_cache_stats (e.g. one batch turn)."""
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+query_cache_stats: ContextVar[Optional[QueryCacheStats]] = ContextVar("query_cache_stats", default=None)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that keeps the most recent query vectors in memory.
+    
+    Query embeddings are admitted through the rate limiter on a cache miss
+    only. Document embeddings pass straight through; callers that embed
+    documents do their own admission (ingestion runs at background priority).
+    """
+    
+    def __init__(self, inner: Embeddings, max_entries: int):
+        self.inner = inner
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _get(self, text: str) -> Optional[list[float]]:
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+            return vector
+    
+    def prime(self, texts: list[str], vectors: list[list[float]]) -> None:
+        """
+        Store query vectors computed elsewhere (e.g. one batched call).
+        
+        Args:
+            texts: Query texts, exactly as they will be searched
+            vectors: Their embeddings, in the same order
+        """
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._cache[text] = vector
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+    
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> list[float]:
+        vector = self._get(text)
+        stats = query_cache_stats.get()
+        if vector is not None:
+            metrics.increment("embeddings.query_cache.hits")
+            if stats is not None:
+                stats.hits += 1
+            return vector
+        metrics.increment("embeddings.query_cache.misses")
+        if stats is not None:
+            stats.misses += 1
+        rate_limiter.acquire_sync(settings.openai_embedding_model, estimate_tokens(text))
+        vector = self.inner.embed_query(text)
+        self.prime([text], [vector])
+        return vector
+
+
+# Initialize OpenAI embeddings (query vectors cached in front of the API)
+embeddings = CachedQueryEmbeddings(
+    create_embeddings(settings.openai_embedding_dimensions),
+    max_entries=settings.query_embedding_cache_size
 )
 
 
@@ -1,6 +1,11 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import ingest, chat
+from app.services.metrics import metrics
+from app.agent.wilmer_agent import get_agent, get_chitchat_chain
+from app.config import settings
+from app.db.schema import check_query_plan
 
 
 app = FastAPI(
@@ -18,6 +23,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("startup")
+async def warm_up():
+    """Build the agent and chit-chat chain before the first request, so every worker starts warm."""
+    get_agent()
+    get_chitchat_chain()
+
+
+@app.on_event("startup")
+async def check_schema():
+    """Warn if migrations are pending or similarity search doesn't use the HNSW index."""
+    if settings.database_url and settings.schema_check_on_startup:
+        await asyncio.get_running_loop().run_in_executor(None, check_query_plan)
+
+
 # Include routers
 app.include_router(ingest.router, tags=["Ingestion"])
 app.include_router(chat.router, tags=["Chat"])
@@ -43,3 +63,11 @@ async def health_check():
         "status": "healthy",
         "service": "chatbot-api"
     }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Expose in-process counters and latency summaries.
+    """
+    return metrics.snapshot()
@@ -22,6 +22,29 @@ class ChatResponse(BaseModel):
     output: str = Field(..., description="Agent's response")
 
 
+class BatchChatItem(BaseModel):
+    """One question of a batch chat request (one JSONL line)."""
+    id: Optional[str] = Field(None, description="Caller's identifier, echoed in the result")
+    message: str = Field(..., description="User's message")
+    conversation_history: List[ChatMessage] = Field(
+        default_factory=list,
+        description="Previous conversation messages"
+    )
+
+
+class BatchChatResult(ChatResponse):
+    """Result of one batch chat item (one JSONL line), in completion order."""
+    index: int = Field(..., description="Position of the item in the request (0-based)")
+    id: Optional[str] = None
+    route: str
+    error: Optional[str] = Field(None, description="Error message; output is empty when set")
+    deduplicated: bool = Field(False, description="Answer shared with an identical question in the batch")
+    cached: bool = Field(False, description="Answer served from the shared answer cache")
+    elapsed_ms: float = Field(..., description="Time spent producing the answer")
+    query_cache_hits: int = Field(0, description="Searches whose query embedding was already cached (e.g. prewarmed)")
+    query_cache_misses: int = Field(0, description="Searches that had to embed their query")
+
+
 class IngestResponse(BaseModel):
     """Response model for document ingestion."""
     success: bool
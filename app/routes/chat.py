@@ -1,80 +1,237 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.models.chat_models import ChatRequest
-from app.agent.wilmer_agent import get_agent
-import json
+from app.agent.router import classify_turn, get_route_model, ROUTE_RAG
+from app.config import settings
+from app.agent.streaming import StreamingCallbackHandler
+from app.agent.usage import UsageCallbackHandler
+from app.agent.deadline import Deadline, DeadlineExceeded
+from app.services.chat_service import (
+    run_chat_turn,
+    estimate_turn_tokens,
+    estimate_turn_calls,
+    build_degraded_answer,
+)
+from app.services.batch_service import parse_batch_lines, run_batch
+from app.services.coalescing_service import request_coalescer
+from app.services.data_stream import DataStreamWriter
+from app.services.metrics import metrics
+from app.db.shared_state import get_kb_version
+from app.services.rate_limiter import (
+    rate_limiter,
+    RateLimitExceeded,
+    PRIORITY_CONTINUING,
+    PRIORITY_NEW,
+)
+import math
+import time
 import asyncio
-from typing import AsyncGenerator
-from langchain_core.messages import HumanMessage, AIMessage
+from typing import AsyncGenerator, Optional
 
 router = APIRouter()
 
 
-async def generate_chat_stream(message: str, conversation_history: list) -> AsyncGenerator[str, None]:
+async def admit_turn(message: str, conversation_history: list, route: str) -> None:
+    """
+    Admit a chat turn through the client-side rate limiter.
+    
+    Args:
+        message: User's message
+        conversation_history: Previous conversation messages
+        route: Route serving the turn
+        
+    Raises:
+        RateLimitExceeded: If the turn can't be admitted within the allowed wait
+    """
+    priority = PRIORITY_CONTINUING if conversation_history else PRIORITY_NEW
+    await rate_limiter.acquire(
+        get_route_model(route),
+        estimate_turn_tokens(message, conversation_history, route),
+        priority=priority,
+        requests=estimate_turn_calls(route)
+    )
+
+
+async def generate_chat_stream(
+    message: str,
+    conversation_history: list,
+    route: str = ROUTE_RAG,
+    coalesce_key: Optional[str] = None,
+    deadline: Optional[float] = None,
+    admitted: bool = False
+) -> AsyncGenerator[str, None]:
     """
     Generate streaming chat response compatible with Vercel AI SDK.
     
     Uses the Vercel AI SDK Data Stream Protocol format:
-    - Text chunks: 0:"token"
-    - Finish: d:{"finishReason":"stop"}
+    - Text chunks: 0:"token" (LLM tokens coalesced per short time/size window)
+    - Tool calls: 9:{"toolCallId", "toolName", "args"}
+    - Tool results: a:{"toolCallId", "result"} with the cited sources
+    - Citations: 8:[{"type": "citations", "sources": [...]}]
+    - Usage: 8:[{"type": "usage", "promptTokens", "cachedPromptTokens", "completionTokens"}]
+    - Finish: d:{"finishReason":"stop","usage":{"promptTokens","completionTokens"}}
+    
+    First-turn questions are coalesced: concurrent requests with the same
+    normalized message share a single agent execution. If the client
+    disconnects, the agent run is cancelled unless other requests are
+    waiting on it. While requests wait on it, the shared run gets the
+    latest of their deadlines.
+    
+    When the deadline is near (or the shared run ran out of time) and no
+    answer text has been streamed yet, the run is stopped and a degraded
+    answer (retrieved passages in the persona template) is sent instead; if
+    the answer was already streaming, it is cut off with finishReason "length".
     
     Args:
         message: User's message
         conversation_history: Previous conversation messages
+        route: Route serving the turn (see app.agent.router)
+        coalesce_key: Key to share the agent execution under (None disables coalescing)
+        deadline: time.monotonic() by which the turn must be answered (None disables it)
+        admitted: Whether the turn was already admitted by the rate limiter; if not,
+            it is admitted right before the agent runs
         
     Yields:
         Vercel AI SDK formatted stream chunks
     """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    handler = StreamingCallbackHandler(loop, events)
+    writer = DataStreamWriter(
+        flush_interval=settings.stream_flush_interval,
+        max_buffer_chars=settings.stream_max_buffer_chars
+    )
+    citations = []
+    usage = UsageCallbackHandler()
+    started = time.monotonic()
+    first_token = True
+    deadline_exceeded = False
+    # Leave time for the degraded answer before the deadline itself
+    cutoff = deadline - settings.chat_deadline_reserve_seconds if deadline is not None else None
+    # The run's own deadline, pushed back by requests that coalesce onto it
+    run_deadline = Deadline(cutoff) if cutoff is not None else None
+    
+    async def execute():
+        nonlocal admitted
+        # Admission happens here too, so a follower falling back after a failed
+        # leader (or a request whose cached answer expired) is still throttled
+        if not admitted:
+            admitted = True
+            await admit_turn(message, conversation_history, route)
+        return await run_chat_turn(
+            message, conversation_history, route, callbacks=[handler], usage=usage, deadline=run_deadline
+        )
+    
+    async def answer() -> str:
+        if coalesce_key is not None:
+            return await request_coalescer.run(coalesce_key, execute, deadline=run_deadline)
+        return (await execute()).output
+    
+    task = asyncio.create_task(answer())
+    # None marks the end of the event stream
+    task.add_done_callback(lambda _: events.put_nowait(None))
+    # The run may outlive this request (deadline, disconnect): don't leave its error unretrieved
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    
+    def stop_run(reason: str) -> None:
+        # Stop producing tokens nobody will read. A leader keeps running while other
+        # requests wait on its execution; a follower only stops its own wait (shielded)
+        if (
+            coalesce_key is not None
+            and request_coalescer.is_leader(coalesce_key, task)
+            and request_coalescer.follower_count(coalesce_key)
+        ):
+            return
+        handler.cancel(reason)
+        task.cancel()
+    
     try:
-        agent = get_agent()
-
-        # Format conversation history for the agent
-        chat_history = []
-        for msg in conversation_history:
-            role = msg.role
-            content = msg.content
-            if role == "user":
-                chat_history.append(HumanMessage(content=content))
-            elif role == "assistant":
-                chat_history.append(AIMessage(content=content))
-        
-        # Prepare input for the agent
-        agent_input = {
-            "input": message,
-            "chat_history": chat_history
-        }
-        
-        # Run agent in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
+        while True:
+            timeout = writer.time_until_flush()
+            if cutoff is not None:
+                remaining = max(0.0, cutoff - time.monotonic())
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if cutoff is not None and time.monotonic() >= cutoff:
+                    deadline_exceeded = True
+                    break
+                yield writer.flush()
+                continue
+            
+            if event is None:
+                break
+            
+            if event[0] == "text":
+                if first_token:
+                    first_token = False
+                    metrics.observe(f"chat.route.{route}.time_to_first_token", time.monotonic() - started)
+                writer.write_text(event[1])
+            elif event[0] == "tool_call" and settings.stream_tool_events:
+                writer.tool_call(*event[1:])
+            elif event[0] == "tool_result":
+                citations.extend(c for c in event[2] if c not in citations)
+                if settings.stream_tool_events:
+                    writer.tool_result(event[1], event[2])
+            
+            if writer.should_flush():
+                yield writer.flush()
         
-        def run_agent():
-            return agent.invoke(agent_input)
+        # The run gave up first, e.g. a coalesced run that ran out of time: don't run it again
+        if (
+            deadline is not None
+            and task.done()
+            and not task.cancelled()
+            and isinstance(task.exception(), DeadlineExceeded)
+        ):
+            deadline_exceeded = True
         
-        result = await loop.run_in_executor(None, run_agent)
+        if deadline_exceeded:
+            metrics.increment("chat.deadline_exceeded")
+            stop_run("Se agotó el tiempo de respuesta")
+            if handler.streamed_text:
+                # Part of the real answer is already on screen
+                writer.finish("length")
+            else:
+                writer.write_text(await build_degraded_answer(
+                    message, route, handler.tool_outputs, timeout=deadline - time.monotonic()
+                ))
+                if citations:
+                    writer.annotations([{"type": "citations", "sources": citations}])
+                writer.finish("stop")
+            yield writer.flush()
+            return
         
-        # Extract the final output
-        output = result.get("output", "")
+        output = task.result()
         
-        # Stream the response token by token using Vercel AI SDK format
-        # Format: 0:"token" (0 = text type)
-        words = output.split()
+        # Followers and cached answers get the final text in one go
+        if not handler.streamed_text:
+            writer.write_text(output)
         
-        for i, word in enumerate(words):
-            # Add space before word except for the first one
-            token = word if i == 0 else f" {word}"
-            
-            # Vercel AI SDK Data Stream Protocol: 0:"text_content"
-            yield f'0:{json.dumps(token)}\n'
-            
-            # Small delay to simulate streaming
-            await asyncio.sleep(0.02)
+        if citations:
+            writer.annotations([{"type": "citations", "sources": citations}])
         
-        # Send finish event: d:{"finishReason":"stop"}
-        yield f'd:{json.dumps({"finishReason": "stop"})}\n'
+        # Zero for followers and cached answers: this request made no LLM calls
+        writer.annotations([{
+            "type": "usage",
+            "promptTokens": usage.input_tokens,
+            "cachedPromptTokens": usage.cached_input_tokens,
+            "completionTokens": usage.output_tokens,
+        }])
+        writer.finish("stop", usage={"promptTokens": usage.input_tokens, "completionTokens": usage.output_tokens})
+        yield writer.flush()
         
     except Exception as e:
-        # Send error event: 3:"error message"
-        yield f'3:{json.dumps(str(e))}\n'
+        writer.error(str(e))
+        yield writer.flush()
+    
+    finally:
+        # Client gone (or failure)
+        if not task.done() and not deadline_exceeded:
+            metrics.increment("chat.cancelled_on_disconnect")
+            stop_run("El cliente cerró la conexión")
 
 
 @router.post("/api/chat")
@@ -84,8 +241,11 @@ async def chat(request: ChatRequest):
     
     This endpoint:
     1. Receives a user message and conversation history
-    2. Executes the Dr. Wilmer Gálvez agent
-    3. Streams the response token by token
+    2. Routes the turn: chit-chat to the small model, program questions to the RAG agent
+    3. Admits the turn through the client-side rate limiter (503 + Retry-After when saturated)
+    4. Executes the Dr. Wilmer Gálvez agent within CHAT_DEADLINE_SECONDS
+    5. Streams the response as it is generated (with tool calls and citations),
+       or a degraded answer from the retrieved passages if the deadline is near
     
     Args:
         request: ChatRequest with message and conversation history
@@ -100,8 +260,39 @@ async def chat(request: ChatRequest):
             detail="El mensaje no puede estar vacío"
         )
     
+    # The deadline covers the whole turn, including the rate-limit wait
+    deadline = None
+    if settings.chat_deadline_seconds > 0:
+        deadline = time.monotonic() + settings.chat_deadline_seconds
+    
+    route = ROUTE_RAG
+    if settings.router_enabled:
+        route = classify_turn(request.message, request.conversation_history)
+    
+    coalesce_key = None
+    if settings.coalesce_enabled and not request.conversation_history:
+        coalesce_key = request_coalescer.make_key(request.message, await asyncio.to_thread(get_kb_version))
+    
+    # Cached answers and followers of an in-flight identical question don't call the provider:
+    # they are admitted later, only if they end up running the agent themselves
+    admitted = False
+    if coalesce_key is None or not (
+        request_coalescer.is_inflight(coalesce_key) or await request_coalescer.is_cached(coalesce_key)
+    ):
+        try:
+            await admit_turn(request.message, request.conversation_history, route)
+        except RateLimitExceeded as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        admitted = True
+    
     return StreamingResponse(
-        generate_chat_stream(request.message, request.conversation_history),
+        generate_chat_stream(
+            request.message, request.conversation_history, route, coalesce_key, deadline, admitted
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -109,3 +300,56 @@ async def chat(request: ChatRequest):
             "X-Accel-Buffering": "no"  # Disable buffering in nginx
         }
     )
+
+
+async def generate_batch_stream(items: list) -> AsyncGenerator[str, None]:
+    """
+    Stream batch results as JSON lines, one per item as soon as it finishes.
+    
+    Args:
+        items: Parsed batch items
+        
+    Yields:
+        One JSON line per result
+    """
+    async for result in run_batch(items):
+        yield result.model_dump_json() + "\n"
+
+
+@router.post("/api/chat/batch")
+async def chat_batch(request: Request):
+    """
+    Batch chat endpoint for offline evaluation and bulk question answering.
+    
+    The body is JSONL: one {"id", "message", "conversation_history"} object
+    (or a bare JSON string) per line. Identical first-turn questions are
+    answered once, query embeddings are computed in batched calls, and turns
+    run with bounded concurrency at background priority.
+    
+    Args:
+        request: Raw request with the JSONL body
+        
+    Returns:
+        StreamingResponse with one JSON result per line (application/x-ndjson),
+        in completion order, each with its input index and timing
+    """
+    body = (await request.body()).decode("utf-8")
+    
+    try:
+        items = parse_batch_lines(body.splitlines())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="El lote no contiene preguntas")
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote excede el máximo de {settings.batch_max_items} preguntas"
+        )
+    
+    return StreamingResponse(
+        generate_batch_stream(items),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
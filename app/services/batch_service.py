@@ -0,0 +1,229 @@
+"""
+Batch chat: answer many questions in one request, for offline evaluation
+(QA replays after a knowledge-base update) and bulk question answering.
+
+- Identical first-turn questions (same normalized text) are answered once
+- Query embeddings of the RAG questions are computed in a few batched
+  embeddings calls and prewarm the query-embedding cache. They only help
+  when the agent searches with the question as asked, so each result
+  reports its query-cache hits and misses
+- Turns run with bounded concurrency at background priority, so live chat
+  traffic is served first; rate-limit rejections are waited out and retried
+- Results are yielded as soon as each question finishes
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, Iterable, Optional
+from pydantic import ValidationError
+from app.agent.router import classify_turn, get_route_model, ROUTE_RAG
+from app.config import settings
+from app.db.shared_state import get_kb_version
+from app.db.supabase_client import embeddings, query_cache_stats, QueryCacheStats
+from app.models.chat_models import BatchChatItem, BatchChatResult
+from app.services.chat_service import ChatTurnResult, run_chat_turn, estimate_turn_tokens, estimate_turn_calls
+from app.services.coalescing_service import request_coalescer, normalize_message
+from app.services.metrics import metrics
+from app.services.rate_limiter import (
+    rate_limiter,
+    RateLimitExceeded,
+    estimate_tokens,
+    PRIORITY_BACKGROUND,
+)
+
+
+def parse_batch_lines(lines: Iterable[str]) -> list[BatchChatItem]:
+    """
+    Parse JSONL batch input.
+
+    Each non-empty line is either an object with "message" (and optionally
+    "id" and "conversation_history") or a bare JSON string with the message.
+
+    Args:
+        lines: Lines of the JSONL document
+
+    Returns:
+        Parsed items in input order
+
+    Raises:
+        ValueError: If a line is not valid JSON or not a valid item
+    """
+    items = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            if isinstance(data, str):
+                data = {"message": data}
+            item = BatchChatItem.model_validate(data)
+        except (json.JSONDecodeError, ValidationError) as e:
+            raise ValueError(f"Línea {number}: entrada inválida ({e})")
+        if not item.message.strip():
+            raise ValueError(f"Línea {number}: el mensaje no puede estar vacío")
+        items.append(item)
+    return items
+
+
+def group_items(items: list[BatchChatItem]) -> list[list[int]]:
+    """
+    Group the indexes of items that can share one answer.
+
+    First-turn questions are grouped by normalized message; questions with
+    conversation history depend on it and are never grouped.
+
+    Args:
+        items: Batch items
+
+    Returns:
+        Groups of item indexes, in order of first appearance
+    """
+    groups: dict[str, list[int]] = {}
+    for index, item in enumerate(items):
+        if item.conversation_history:
+            key = f"turn:{index}"
+        else:
+            key = f"message:{normalize_message(item.message)}"
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
+
+async def _admit(model: str, tokens: int, requests: int = 1) -> None:
+    """Admit a background call, waiting out rate-limit rejections instead of failing."""
+    while True:
+        try:
+            await rate_limiter.acquire(model, tokens, priority=PRIORITY_BACKGROUND, requests=requests)
+            return
+        except RateLimitExceeded as e:
+            metrics.increment("batch.rate_limit_retries")
+            await asyncio.sleep(e.retry_after)
+
+
+async def prewarm_query_embeddings(messages: list[str]) -> int:
+    """
+    Embed questions in batched calls and store them in the query-embedding cache.
+
+    The search tool then finds the vector cached whenever the agent searches
+    with the question as asked.
+
+    Args:
+        messages: Questions to embed (already deduplicated)
+
+    Returns:
+        Number of embeddings calls made
+    """
+    loop = asyncio.get_running_loop()
+    texts = list(dict.fromkeys(message.strip() for message in messages))
+    calls = 0
+
+    for start in range(0, len(texts), settings.batch_embedding_size):
+        batch = texts[start:start + settings.batch_embedding_size]
+        await _admit(settings.openai_embedding_model, sum(estimate_tokens(text) for text in batch))
+        vectors = await loop.run_in_executor(None, embeddings.embed_documents, batch)
+        embeddings.prime(batch, vectors)
+        calls += 1
+
+    metrics.increment("batch.embedding_calls", calls)
+    return calls
+
+
+async def _answer(item: BatchChatItem, route: str) -> tuple[str, bool]:
+    """
+    Answer one item, sharing the answer cache and in-flight executions with live traffic.
+
+    Returns:
+        Tuple of (answer, served from the answer cache)
+    """
+    async def execute() -> ChatTurnResult:
+        await _admit(
+            get_route_model(route),
+            estimate_turn_tokens(item.message, item.conversation_history, route),
+            estimate_turn_calls(route)
+        )
+        return await run_chat_turn(item.message, item.conversation_history, route)
+
+    if not settings.coalesce_enabled or item.conversation_history:
+        return (await execute()).output, False
+
+    key = request_coalescer.make_key(item.message, await asyncio.to_thread(get_kb_version))
+    cached = await request_coalescer.is_cached(key)
+    return await request_coalescer.run(key, execute), cached
+
+
+async def run_batch(
+    items: list[BatchChatItem],
+    concurrency: Optional[int] = None
+) -> AsyncGenerator[BatchChatResult, None]:
+    """
+    Answer a batch of questions.
+
+    Args:
+        items: Batch items
+        concurrency: Maximum turns running at once (defaults to settings.batch_concurrency)
+
+    Yields:
+        One result per item, in completion order
+    """
+    groups = group_items(items)
+    routes = [
+        classify_turn(items[group[0]].message, items[group[0]].conversation_history)
+        if settings.router_enabled else ROUTE_RAG
+        for group in groups
+    ]
+    metrics.increment("batch.items", len(items))
+    metrics.increment("batch.deduplicated", len(items) - len(groups))
+
+    rag_messages = [items[group[0]].message for group, route in zip(groups, routes) if route == ROUTE_RAG]
+    if rag_messages and settings.batch_prewarm_embeddings:
+        try:
+            await prewarm_query_embeddings(rag_messages)
+        except Exception as e:
+            # Not fatal: the search tool embeds each query on its own
+            print(f"Error prewarming query embeddings: {e}")
+
+    semaphore = asyncio.Semaphore(concurrency or settings.batch_concurrency)
+
+    async def run_group(group: list[int], route: str) -> list[BatchChatResult]:
+        first = items[group[0]]
+        # Each group runs in its own task, so these stats only see this turn's searches
+        stats = QueryCacheStats()
+        query_cache_stats.set(stats)
+        async with semaphore:
+            start = time.perf_counter()
+            output, cached, error = "", False, None
+            try:
+                output, cached = await _answer(first, route)
+            except Exception as e:
+                metrics.increment("batch.errors")
+                error = str(e) or type(e).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        metrics.increment("batch.query_cache.hits", stats.hits)
+        metrics.increment("batch.query_cache.misses", stats.misses)
+
+        return [
+            BatchChatResult(
+                index=index,
+                id=items[index].id,
+                output=output,
+                route=route,
+                error=error,
+                deduplicated=position > 0,
+                cached=cached,
+                elapsed_ms=round(elapsed_ms, 1),
+                query_cache_hits=stats.hits if position == 0 else 0,
+                query_cache_misses=stats.misses if position == 0 else 0
+            )
+            for position, index in enumerate(group)
+        ]
+
+    tasks = [asyncio.create_task(run_group(group, route)) for group, route in zip(groups, routes)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for result in await finished:
+                yield result
+    finally:
+        # Consumer gone (e.g. client disconnected): stop the remaining turns
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,246 @@
+import asyncio
+import contextvars
+import time
+from typing import NamedTuple, Optional, Union
+from langchain_core.messages import HumanMessage, AIMessage
+from app.agent.wilmer_agent import get_agent, get_chitchat_chain
+from app.agent.prompts import (
+    SYSTEM_PROMPT,
+    CHITCHAT_PROMPT,
+    DEGRADED_RESPONSE_TEMPLATE,
+    DEGRADED_PASSAGE_TEMPLATE,
+    DEGRADED_NO_CONTEXT_RESPONSE,
+)
+from app.agent.deadline import Deadline, turn_deadline, run_with_deadline
+from app.agent.router import ROUTE_CHITCHAT, ROUTE_RAG, get_route_model
+from app.agent.tools import parse_search_results, retrieve_documents, format_source
+from app.agent.usage import UsageCallbackHandler, estimate_cost
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.rate_limiter import estimate_tokens
+
+
+class ChatTurnResult(NamedTuple):
+    """Outcome of a chat turn."""
+    output: str
+    # False when the agent was stopped at its iteration limit or recovered from
+    # an output parsing error: the answer is shown but must not be cached
+    completed: bool
+
+
+def build_chat_history(conversation_history: list) -> list:
+    """
+    Convert API conversation messages into LangChain messages.
+
+    Args:
+        conversation_history: Previous conversation messages
+
+    Returns:
+        List of HumanMessage/AIMessage objects
+    """
+    chat_history = []
+    for msg in conversation_history:
+        role = msg.role
+        content = msg.content
+        if role == "user":
+            chat_history.append(HumanMessage(content=content))
+        elif role == "assistant":
+            chat_history.append(AIMessage(content=content))
+    return chat_history
+
+
+def estimate_turn_tokens(message: str, conversation_history: list, route: str) -> int:
+    """
+    Estimate the tokens a chat turn will consume, for admission control.
+
+    A RAG turn typically makes two LLM calls (tool selection and final
+    answer), each resending the system prompt and history; the second one
+    also carries the retrieved chunks. A chit-chat turn is a single call.
+
+    Args:
+        message: User's message
+        conversation_history: Previous conversation messages
+        route: Route serving the turn
+
+    Returns:
+        Estimated token cost of the turn
+    """
+    history_text = "".join(msg.content for msg in conversation_history)
+
+    if route == ROUTE_CHITCHAT:
+        prompt_tokens = estimate_tokens(SYSTEM_PROMPT + CHITCHAT_PROMPT + history_text + message)
+        return prompt_tokens + settings.llm_output_tokens_estimate
+
+    prompt_tokens = estimate_tokens(SYSTEM_PROMPT + history_text + message)
+    if settings.chunking_strategy == "structured":
+        chunk_tokens = settings.chunk_size_tokens
+    else:
+        chunk_tokens = estimate_tokens("x" * settings.chunk_size)
+    context_tokens = chunk_tokens * settings.similarity_top_k
+    return 2 * prompt_tokens + context_tokens + settings.llm_output_tokens_estimate
+
+
+def estimate_turn_calls(route: str) -> int:
+    """
+    Estimate the provider requests a chat turn makes, for admission control.
+
+    Args:
+        route: Route serving the turn
+
+    Returns:
+        1 for a chit-chat turn, rag_llm_calls_estimate for a RAG turn
+    """
+    if route == ROUTE_CHITCHAT:
+        return 1
+    return settings.rag_llm_calls_estimate
+
+
+async def run_chat_turn(
+    message: str,
+    conversation_history: list,
+    route: str,
+    callbacks: Optional[list] = None,
+    usage: Optional[UsageCallbackHandler] = None,
+    deadline: Union[float, Deadline, None] = None
+) -> ChatTurnResult:
+    """
+    Execute a single chat turn on the given route.
+
+    Records per-route latency, token usage (cached vs uncached prompt
+    tokens) and estimated cost in metrics.
+
+    Args:
+        message: User's message
+        conversation_history: Previous conversation messages
+        route: Route serving the turn (see app.agent.router)
+        callbacks: Extra LangChain callback handlers (e.g. token streaming)
+        usage: Handler to accumulate the turn's token usage in, for per-request reporting
+        deadline: time.monotonic() by which every LLM and tool call of the turn
+            must finish, or a Deadline that may be extended while the turn runs
+            (None for no deadline)
+
+    Returns:
+        ChatTurnResult with the final answer and whether the agent finished normally
+    """
+    if usage is None:
+        usage = UsageCallbackHandler()
+
+    if route == ROUTE_CHITCHAT:
+        runnable = get_chitchat_chain()
+    else:
+        runnable = get_agent()
+
+    # Prepare input for the agent
+    turn_input = {
+        "input": message,
+        "chat_history": build_chat_history(conversation_history)
+    }
+
+    # Run in a thread pool to avoid blocking
+    loop = asyncio.get_event_loop()
+
+    def run_sync():
+        with turn_deadline(deadline):
+            return runnable.invoke(turn_input, config={"callbacks": [usage, *(callbacks or [])]})
+
+    start = time.perf_counter()
+    # Copy the context so per-request context variables reach the agent thread
+    result = await loop.run_in_executor(None, contextvars.copy_context().run, run_sync)
+    metrics.observe(f"chat.route.{route}.latency", time.perf_counter() - start)
+
+    model = get_route_model(route)
+    metrics.increment(f"chat.route.{route}.turns")
+    metrics.increment(f"chat.route.{route}.llm_calls", usage.llm_calls)
+    metrics.increment(f"chat.route.{route}.input_tokens", usage.input_tokens)
+    metrics.increment(f"chat.route.{route}.cached_input_tokens", usage.cached_input_tokens)
+    metrics.increment(f"chat.route.{route}.uncached_input_tokens", usage.uncached_input_tokens)
+    metrics.increment(f"chat.route.{route}.output_tokens", usage.output_tokens)
+    metrics.increment(
+        f"chat.route.{route}.cost_usd",
+        estimate_cost(model, usage.input_tokens, usage.output_tokens, usage.cached_input_tokens)
+    )
+
+    # The agent returns a dict; the chit-chat chain returns the text directly
+    if not isinstance(result, dict):
+        return ChatTurnResult(result, True)
+
+    steps = result.get("intermediate_steps", [])
+    completed = len(steps) < runnable.max_iterations and not any(
+        action.tool == "_Exception" for action, _ in steps
+    )
+    if not completed:
+        metrics.increment(f"chat.route.{route}.incomplete")
+    return ChatTurnResult(result.get("output", ""), completed)
+
+
+def format_degraded_answer(passages: list[dict]) -> str:
+    """
+    Render retrieved passages in the persona's degraded-answer template.
+    
+    Args:
+        passages: {"source", "content"} passages, best first
+        
+    Returns:
+        Answer text (a generic apology when there are no passages)
+    """
+    items = []
+    seen = set()
+    for passage in passages:
+        content = " ".join(passage["content"].split())
+        if not content or content in seen:
+            continue
+        seen.add(content)
+        if len(content) > settings.degraded_passage_chars:
+            content = content[:settings.degraded_passage_chars].rsplit(" ", 1)[0] + "…"
+        items.append(DEGRADED_PASSAGE_TEMPLATE.format(content=content, source=passage["source"]))
+        if len(items) == settings.degraded_max_passages:
+            break
+    
+    if not items:
+        return DEGRADED_NO_CONTEXT_RESPONSE
+    return DEGRADED_RESPONSE_TEMPLATE.format(passages="\n".join(items))
+
+
+async def build_degraded_answer(
+    message: str,
+    route: str,
+    tool_outputs: list[str],
+    timeout: float
+) -> str:
+    """
+    Build the answer sent when a turn runs out of time, without calling the LLM.
+    
+    Uses the passages the search tool already returned in this turn; if it
+    hadn't run yet, does one quick retrieval for the user's message within
+    the remaining time.
+    
+    Args:
+        message: User's message
+        route: Route serving the turn
+        tool_outputs: Raw outputs of the search tool so far
+        timeout: Seconds available for the quick retrieval
+        
+    Returns:
+        Degraded answer text
+    """
+    metrics.increment("chat.degraded_fallback")
+    passages = [passage for output in tool_outputs for passage in parse_search_results(output)]
+    
+    if not passages and route == ROUTE_RAG and timeout > 0:
+        loop = asyncio.get_running_loop()
+        try:
+            documents = await asyncio.wait_for(
+                loop.run_in_executor(None, run_with_deadline, time.monotonic() + timeout, retrieve_documents, message),
+                timeout
+            )
+            passages = [
+                {"source": format_source(doc.metadata), "content": doc.page_content}
+                for doc in documents
+            ]
+            metrics.increment("chat.degraded_fallback.retrieval")
+        except Exception as e:
+            print(f"Error retrieving passages for degraded answer: {e!r}")
+    
+    if not passages:
+        metrics.increment("chat.degraded_fallback.no_context")
+    return format_degraded_answer(passages)
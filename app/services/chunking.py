@@ -0,0 +1,341 @@
+"""
+Structure-aware chunking for government plan documents.
+
+Instead of cutting every N characters with overlap, the text is parsed into
+blocks (headings, paragraphs, list items / numbered proposals) and blocks are
+packed into chunks measured in tokens. Chunks never straddle a section
+boundary, list items are never cut unless a single item is larger than a
+chunk, and the heading path of each chunk is stored in its metadata.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Optional
+from langchain_core.documents import Document
+from app.services.rate_limiter import estimate_tokens
+
+
+# "1.", "1.2", "1)", "a)", "-", "•", ... at the start of a line
+LIST_ITEM_PATTERN = re.compile(r"^(?:[-•*▪●◦–]|\d{1,3}(?:\.\d{1,3})*[.)]|[a-zA-Z][.)])\s+")
+# Numbered or named section markers: "1.", "1.2", "IV.", "Capítulo 2", "Eje 3:", ...
+SECTION_MARKER_PATTERN = re.compile(
+    r"^(?:\d{1,2}(?:\.\d{1,2})*\.?|[IVXLC]{1,6}\.|"
+    r"(?:cap[ií]tulo|secci[oó]n|eje|pilar|t[ií]tulo|parte)\s+[\w.]+[.:]?)\s+",
+    re.IGNORECASE
+)
+MARKDOWN_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+")
+
+# Lowercase words allowed inside a title ("Lucha Frontal contra la Corrupción")
+TITLE_CONNECTORS = frozenset((
+    "a", "al", "ante", "con", "contra", "de", "del", "e", "el", "en", "la", "las",
+    "los", "o", "para", "por", "sin", "sobre", "u", "y",
+))
+# Capitalized words that open a sentence right after an inline title ("... Candidato El Dr. ...")
+SENTENCE_OPENERS = frozenset((
+    "A", "Al", "Ante", "Aunque", "Como", "Con", "Desde", "Durante", "El", "En", "Esta",
+    "Este", "Estas", "Estos", "La", "Las", "Lo", "Los", "Para", "Por", "Según", "Si",
+    "Su", "Sus", "Tras", "Un", "Una",
+))
+
+# A heading is a short line that doesn't end like a sentence
+MAX_HEADING_WORDS = 12
+# Longer numbered lines are proposals (list items), not section titles
+MAX_NUMBERED_HEADING_WORDS = 6
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken no disponible, usando estimación de tokens: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with the embedding models' tokenizer (cl100k_base).
+
+    Falls back to a ~4 characters per token estimate when tiktoken or its
+    encoding file is not available.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_inline_heading(paragraph: str) -> tuple[str, str]:
+    """
+    Split a title that runs into the first sentence of its paragraph.
+
+    In word-per-line PDFs a section title is not on a line of its own:
+    "Perfil Biográfico y Profesional del Candidato El Dr. Wilmer Gálvez se
+    presenta..." The title is the leading run of capitalized words and
+    lowercase connectors that ends right before a capitalized sentence
+    opener ("El", "La", "En", ...).
+
+    Args:
+        paragraph: Paragraph text on a single line
+
+    Returns:
+        Tuple of (title, rest), with an empty title if the paragraph doesn't start with one
+    """
+    words = paragraph.split()
+    for index, word in enumerate(words[:MAX_HEADING_WORDS + 1]):
+        if index >= 2 and word in SENTENCE_OPENERS and words[index - 1].lower() not in TITLE_CONNECTORS:
+            return " ".join(words[:index]), " ".join(words[index:])
+        if not (word[:1].isupper() or word in TITLE_CONNECTORS):
+            break
+    return "", paragraph
+
+
+def normalize_pdf_text(text: str) -> str:
+    """
+    Undo common pypdf extraction artifacts.
+
+    Some PDFs come out as one word per line separated by blank lines, with
+    each paragraph starting on a line that holds several words. Those words
+    are joined back into one line per paragraph, and a section title running
+    into the paragraph is put on its own line as a "## " heading. Runs of
+    spaces are collapsed.
+
+    Args:
+        text: Text returned by page.extract_text()
+
+    Returns:
+        Cleaned text with one logical line per line
+    """
+    lines = [line.rstrip() for line in text.split("\n")]
+    blank_lines = sum(1 for line in lines if not line.strip())
+
+    if lines and blank_lines / len(lines) > 0.3:
+        # Word-per-line layout: blank lines are word separators, not paragraph breaks
+        paragraphs: list[str] = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if len(line.split()) > 1 or not paragraphs:
+                paragraphs.append(line)
+            else:
+                paragraphs[-1] += " " + line
+
+        parts = []
+        for paragraph in paragraphs:
+            title, rest = split_inline_heading(re.sub(r"[ \t]+", " ", paragraph))
+            parts.append(f"## {title}\n\n{rest}" if title else rest)
+        text = "\n\n".join(parts)
+    else:
+        text = "\n".join(lines)
+
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+@dataclass
+class Block:
+    """A structural unit of the document."""
+    kind: str  # "heading", "paragraph" or "list_item"
+    text: str
+    page: Optional[int]
+    level: int = 0  # Heading depth (1 = top level)
+
+
+@dataclass
+class _Chunk:
+    units: list = field(default_factory=list)  # (text, page, tokens, block index)
+    tokens: int = 0
+
+
+class StructuredChunker:
+    """Splits documents along headings and list items into token-bounded chunks."""
+
+    def __init__(
+        self,
+        chunk_tokens: int,
+        overlap_tokens: int = 0,
+        length_function: Callable[[str], int] = count_tokens
+    ):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.length_function = length_function
+
+    def _heading_level(self, line: str) -> int:
+        """Return the heading level of a line, or 0 if it is not a heading."""
+        markdown = MARKDOWN_HEADING_PATTERN.match(line)
+        if markdown:
+            return len(markdown.group(1))
+
+        words = line.split()
+        if not words or len(words) > MAX_HEADING_WORDS or line.endswith((".", ",", ";")):
+            return 0
+
+        marker = SECTION_MARKER_PATTERN.match(line)
+        if marker and len(words) <= MAX_NUMBERED_HEADING_WORDS:
+            # "1." -> 1, "1.2" -> 2, "IV." / "Capítulo 2" -> 1
+            numbering = marker.group(0).strip().rstrip(".")
+            return numbering.count(".") + 1 if numbering[:1].isdigit() else 1
+
+        letters = [char for char in line if char.isalpha()]
+        if len(letters) >= 3 and all(char.isupper() for char in letters):
+            return 1
+        if line.endswith(":") and len(words) <= 8:
+            return 2
+        return 0
+
+    def parse_blocks(self, text: str, page: Optional[int] = None) -> list[Block]:
+        """
+        Parse text into headings, paragraphs and list items.
+
+        Args:
+            text: Normalized text
+            page: Page number the text comes from
+
+        Returns:
+            List of blocks in document order
+        """
+        blocks: list[Block] = []
+        current: Optional[Block] = None
+
+        for raw_line in text.split("\n"):
+            line = raw_line.strip()
+            if not line:
+                current = None
+                continue
+
+            level = self._heading_level(line)
+            if level:
+                blocks.append(Block("heading", MARKDOWN_HEADING_PATTERN.sub("", line), page, level))
+                current = None
+            elif LIST_ITEM_PATTERN.match(line):
+                current = Block("list_item", line, page)
+                blocks.append(current)
+            elif current is not None:
+                # Continuation of the previous paragraph or list item
+                current.text += " " + line
+            else:
+                current = Block("paragraph", line, page)
+                blocks.append(current)
+
+        return blocks
+
+    def _split_oversized(self, text: str) -> list[str]:
+        """Split a block larger than a chunk by sentences, then by words."""
+        pieces: list[str] = []
+        for sentence in SENTENCE_PATTERN.split(text):
+            if self.length_function(sentence) <= self.chunk_tokens:
+                pieces.append(sentence)
+                continue
+            words, window = sentence.split(), []
+            for word in words:
+                window.append(word)
+                if self.length_function(" ".join(window)) > self.chunk_tokens:
+                    window.pop()
+                    # A single word longer than a chunk becomes its own piece, never an empty one
+                    if window:
+                        pieces.append(" ".join(window))
+                    window = [word]
+            if window:
+                pieces.append(" ".join(window))
+        return pieces
+
+    def _pack(self, units: list[tuple[str, Optional[int], int, int]]) -> list[_Chunk]:
+        """Greedily pack (text, page, tokens, block index) units of one section into chunks."""
+        chunks: list[_Chunk] = []
+        current = _Chunk()
+
+        for unit in units:
+            if current.units and current.tokens + unit[2] > self.chunk_tokens:
+                chunks.append(current)
+                current = _Chunk()
+                # Optional overlap: carry trailing units of the previous chunk
+                for carried in reversed(chunks[-1].units):
+                    if current.tokens + carried[2] > self.overlap_tokens:
+                        break
+                    current.units.insert(0, carried)
+                    current.tokens += carried[2]
+            current.units.append(unit)
+            current.tokens += unit[2]
+
+        if current.units:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _join(units: list) -> str:
+        """Join units: pieces of the same block with spaces, different blocks with newlines."""
+        text = units[0][0]
+        for previous, unit in zip(units, units[1:]):
+            text += (" " if unit[3] == previous[3] else "\n") + unit[0]
+        return text
+
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        Split page documents into structure-aware chunks.
+
+        Pages of the same file are processed as one stream, so sections and
+        paragraphs continue across page breaks. Each chunk keeps the metadata
+        of its first page plus "section" (heading path), "page_end" when it
+        spans pages, and "tokens".
+
+        Args:
+            documents: Page documents as returned by extract_text_from_pdf
+
+        Returns:
+            List of chunked Document objects
+        """
+        blocks: list[Block] = []
+        base_metadata: dict = {}
+        for doc in documents:
+            base_metadata = base_metadata or {k: v for k, v in doc.metadata.items() if k != "page"}
+            blocks.extend(self.parse_blocks(normalize_pdf_text(doc.page_content), doc.metadata.get("page")))
+
+        # Group blocks into sections keyed by their heading path
+        sections: list[tuple[list[str], list[Block]]] = []
+        path: list[tuple[int, str]] = []
+        for block in blocks:
+            if block.kind == "heading":
+                path = [entry for entry in path if entry[0] < block.level] + [(block.level, block.text)]
+                sections.append(([title for _, title in path], [block]))
+            elif sections:
+                sections[-1][1].append(block)
+            else:
+                sections.append(([], [block]))
+
+        chunks: list[Document] = []
+        for position, (section_path, section_blocks) in enumerate(sections):
+            next_path = sections[position + 1][0] if position + 1 < len(sections) else []
+            if len(section_blocks) == 1 and next_path[:len(section_path)] == section_path != next_path:
+                # Bare title followed by its subsections: it lives on in their section path
+                continue
+            units = []
+            for index, block in enumerate(section_blocks):
+                tokens = self.length_function(block.text)
+                if tokens <= self.chunk_tokens:
+                    units.append((block.text, block.page, tokens, index))
+                else:
+                    units.extend(
+                        (piece, block.page, self.length_function(piece), index)
+                        for piece in self._split_oversized(block.text)
+                    )
+
+            for packed in self._pack(units):
+                pages = [unit[1] for unit in packed.units if unit[1] is not None]
+                metadata = {**base_metadata, "section": " > ".join(section_path), "tokens": packed.tokens}
+                if pages:
+                    metadata["page"] = pages[0]
+                    if pages[-1] != pages[0]:
+                        metadata["page_end"] = pages[-1]
+                chunks.append(Document(page_content=self._join(packed.units), metadata=metadata))
+
+        return chunks
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Awaitable, Callable, Optional
+from app.agent.deadline import Deadline, DeadlineExceeded
+from app.config import settings
+from app.db.shared_state import SharedStateBackend, shared_state
+from app.services.metrics import metrics
+
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a user message so equivalent questions map to the same key.
+
+    Lowercases, strips accents and punctuation, and collapses whitespace,
+    so "¿Qué propones para el agua?" and "que propones para el agua" match.
+
+    Args:
+        message: Raw user message
+
+    Returns:
+        Normalized message
+    """
+    text = unicodedata.normalize("NFKD", message.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class RequestCoalescer:
+    """
+    Single-flight deduplication of identical in-flight agent executions.
+
+    The first request for a key (the leader) runs the work; concurrent
+    requests for the same key (followers) wait for the leader's result
+    instead of starting their own execution.
+
+    Answers are also kept in the shared state for cache_ttl seconds, and
+    leaders take a shared lock, so deduplication and cache hits span all
+    workers rather than a single process. Shared-state calls run in a
+    thread so a busy backend doesn't stall the event loop.
+    """
+
+    # Seconds between shared-cache checks while another worker leads
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, wait_timeout: float, cache_ttl: float, state: SharedStateBackend):
+        self.wait_timeout = wait_timeout
+        self.cache_ttl = cache_ttl
+        self.state = state
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._leaders: dict[str, asyncio.Task] = {}
+        self._deadlines: dict[str, Deadline] = {}
+        self._followers: dict[str, int] = {}
+
+    def make_key(self, message: str, kb_version: int) -> str:
+        """
+        Build the coalescing key for a first-turn message.
+
+        Args:
+            message: User's message
+            kb_version: Current knowledge base version
+
+        Returns:
+            Key shared by all equivalent questions against the same knowledge base
+        """
+        normalized = normalize_message(message)
+        return hashlib.sha256(f"{kb_version}:{normalized}".encode("utf-8")).hexdigest()
+
+    async def get_cached(self, key: str) -> Optional[str]:
+        """
+        Get a previously computed answer from the shared cache.
+
+        Args:
+            key: Coalescing key (see make_key)
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        value = await self._lookup(f"answer:{key}")
+        metrics.increment("coalescing.cache_hits" if value is not None else "coalescing.cache_misses")
+        return value
+
+    async def is_cached(self, key: str) -> bool:
+        """Check whether an answer for the key is in the shared cache."""
+        return await self._lookup(f"answer:{key}") is not None
+
+    async def _lookup(self, state_key: str) -> Optional[str]:
+        try:
+            return await asyncio.to_thread(self.state.get, state_key)
+        except Exception as e:
+            print(f"Error reading shared state: {e}")
+            return None
+
+    async def _store(self, key: str, value: str) -> None:
+        try:
+            await asyncio.to_thread(self.state.set, f"answer:{key}", value, ttl=self.cache_ttl)
+        except Exception as e:
+            print(f"Error writing shared answer cache: {e}")
+
+    def is_inflight(self, key: str) -> bool:
+        """Check whether a leader is currently running for the key."""
+        return key in self._inflight
+
+    def follower_count(self, key: str) -> int:
+        """Get the number of followers waiting on the key's leader."""
+        return self._followers.get(key, 0)
+
+    def is_leader(self, key: str, task: asyncio.Task) -> bool:
+        """Check whether task is running the key's in-flight execution (not following or falling back)."""
+        return self._leaders.get(key) is task
+
+    async def run(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[tuple[str, bool]]],
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Run func once per key, sharing the result with concurrent callers.
+
+        Followers wait at most wait_timeout seconds; if the leader fails,
+        is cancelled, or takes too long, they fall back to running func
+        themselves. A leader that ran out of time is not retried: the
+        followers' deadlines are past too, and running again would only
+        miss them once more. Results func flags as not cacheable (e.g. an
+        agent run stopped at its iteration limit) are shared with the
+        followers already waiting but not stored in the answer cache.
+
+        Args:
+            key: Coalescing key (see make_key)
+            func: Coroutine factory performing the actual work, returning
+                (result, cacheable)
+            deadline: Deadline func runs under; a follower extends the
+                leader's to its own, so the shared run serves the latest waiter
+
+        Returns:
+            Result of the leader's (or the fallback) execution
+
+        Raises:
+            DeadlineExceeded: If the execution (the leader's, for a follower) ran out of time
+        """
+        cached = await self.get_cached(key)
+        if cached is not None:
+            return cached
+
+        future = self._inflight.get(key)
+
+        if future is not None:
+            metrics.increment("coalescing.followers")
+            self._followers[key] = self._followers.get(key, 0) + 1
+            leader_deadline = self._deadlines.get(key)
+            if leader_deadline is not None and deadline is not None:
+                leader_deadline.extend(deadline.at)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout=self.wait_timeout)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                metrics.increment("coalescing.fallbacks")
+            except DeadlineExceeded:
+                raise
+            except Exception:
+                metrics.increment("coalescing.fallbacks")
+            finally:
+                self._followers[key] -= 1
+                if not self._followers[key]:
+                    del self._followers[key]
+            result, _ = await func()
+            return result
+
+        metrics.increment("coalescing.leaders")
+        future = asyncio.get_running_loop().create_future()
+        # Avoid "exception was never retrieved" warnings when nobody followed
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self._leaders[key] = asyncio.current_task()
+        if deadline is not None:
+            self._deadlines[key] = deadline
+
+        try:
+            result = await self._run_fleet_wide(key, func)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            self._leaders.pop(key, None)
+            self._deadlines.pop(key, None)
+
+    async def _run_fleet_wide(self, key: str, func: Callable[[], Awaitable[tuple[str, bool]]]) -> str:
+        """Run func unless another worker already leads the key; then wait for its answer."""
+        lock_key = f"inflight:{key}"
+        try:
+            is_leader = await asyncio.to_thread(self.state.add, lock_key, "1", ttl=self.wait_timeout)
+        except Exception as e:
+            print(f"Error acquiring shared in-flight lock: {e}")
+            is_leader = True
+
+        if not is_leader:
+            metrics.increment("coalescing.remote_followers")
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.POLL_INTERVAL)
+                cached = await self._lookup(f"answer:{key}")
+                if cached is not None:
+                    return cached
+                # Lock released without an answer: the remote leader failed
+                if await self._lookup(lock_key) is None:
+                    break
+            metrics.increment("coalescing.fallbacks")
+            result, _ = await func()
+            return result
+
+        try:
+            result, cacheable = await func()
+            if cacheable:
+                await self._store(key, result)
+            else:
+                metrics.increment("coalescing.uncacheable")
+            return result
+        finally:
+            try:
+                await asyncio.to_thread(self.state.delete, lock_key)
+            except Exception as e:
+                print(f"Error releasing shared in-flight lock: {e}")
+
+
+# Singleton instance
+request_coalescer = RequestCoalescer(
+    wait_timeout=settings.coalesce_wait_timeout,
+    cache_ttl=settings.answer_cache_ttl,
+    state=shared_state
+)
@@ -0,0 +1,132 @@
+"""
+Encoder for the Vercel AI SDK Data Stream Protocol.
+
+Each frame is a line "<type>:<json>\\n". Text tokens are coalesced into a
+single frame per short time/size window, so a fast LLM doesn't turn every
+token into its own HTTP chunk.
+"""
+
+import json
+import time
+from typing import Any, Optional
+
+
+# Frame type codes of the Data Stream Protocol
+TEXT = "0"
+DATA = "2"
+ERROR = "3"
+MESSAGE_ANNOTATIONS = "8"
+TOOL_CALL = "9"
+TOOL_RESULT = "a"
+FINISH_MESSAGE = "d"
+
+# Compact separators and raw UTF-8 keep Spanish text small on the wire
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def encode_frame(frame_type: str, value: Any) -> str:
+    """
+    Encode a single Data Stream Protocol frame.
+
+    Args:
+        frame_type: Frame type code (TEXT, DATA, ERROR, ...)
+        value: JSON-serializable payload
+
+    Returns:
+        Encoded frame line
+    """
+    return f"{frame_type}:{_encode(value)}\n"
+
+
+class DataStreamWriter:
+    """Buffers Data Stream Protocol frames and coalesces consecutive text tokens."""
+
+    def __init__(self, flush_interval: float, max_buffer_chars: int):
+        self.flush_interval = flush_interval
+        self.max_buffer_chars = max_buffer_chars
+        self._text: list[str] = []
+        self._text_chars = 0
+        self._frames: list[str] = []
+        self._pending_since: Optional[float] = None
+
+    def _mark_pending(self) -> None:
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+
+    def _close_text(self) -> None:
+        if self._text:
+            self._frames.append(encode_frame(TEXT, "".join(self._text)))
+            self._text = []
+            self._text_chars = 0
+
+    def write_text(self, text: str) -> None:
+        """Append text, merged with adjacent text into one frame."""
+        if not text:
+            return
+        self._text.append(text)
+        self._text_chars += len(text)
+        self._mark_pending()
+
+    def write_frame(self, frame_type: str, value: Any) -> None:
+        """Append a non-text frame, keeping its order relative to buffered text."""
+        self._close_text()
+        self._frames.append(encode_frame(frame_type, value))
+        self._mark_pending()
+
+    def tool_call(self, tool_call_id: str, tool_name: str, args: dict) -> None:
+        """Append a tool call frame."""
+        self.write_frame(TOOL_CALL, {"toolCallId": tool_call_id, "toolName": tool_name, "args": args})
+
+    def tool_result(self, tool_call_id: str, result: Any) -> None:
+        """Append a tool result frame."""
+        self.write_frame(TOOL_RESULT, {"toolCallId": tool_call_id, "result": result})
+
+    def annotations(self, annotations: list) -> None:
+        """Append message annotations (e.g. citations)."""
+        self.write_frame(MESSAGE_ANNOTATIONS, annotations)
+
+    def data(self, items: list) -> None:
+        """Append custom data items."""
+        self.write_frame(DATA, items)
+
+    def error(self, message: str) -> None:
+        """Append an error frame."""
+        self.write_frame(ERROR, message)
+
+    def finish(self, reason: str = "stop", usage: Optional[dict] = None) -> None:
+        """Append the finish message frame, optionally with {"promptTokens", "completionTokens"}."""
+        payload = {"finishReason": reason}
+        if usage is not None:
+            payload["usage"] = usage
+        self.write_frame(FINISH_MESSAGE, payload)
+
+    def time_until_flush(self) -> Optional[float]:
+        """
+        Seconds left in the current coalescing window.
+
+        Returns:
+            None when nothing is buffered, otherwise the remaining seconds (>= 0)
+        """
+        if self._pending_since is None:
+            return None
+        elapsed = time.monotonic() - self._pending_since
+        return max(0.0, self.flush_interval - elapsed)
+
+    def should_flush(self) -> bool:
+        """Check whether the buffer is full or its window has elapsed."""
+        if self._pending_since is None:
+            return False
+        return self._text_chars >= self.max_buffer_chars or self.time_until_flush() == 0
+
+    def flush(self) -> str:
+        """
+        Drain the buffer.
+
+        Returns:
+            All buffered frames as one string (empty if nothing was buffered)
+        """
+        self._close_text()
+        chunk = "".join(self._frames)
+        self._frames = []
+        self._pending_since = None
+        return chunk
@@ -1,26 +1,61 @@
+import asyncio
+from io import BytesIO
 from typing import BinaryIO
 from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from app.config import settings
+from app.services.chunking import StructuredChunker
+from app.services.pdf_cache import pdf_text_cache
 from app.db.supabase_client import get_vector_store, clear_all_documents
+from app.db.shared_state import bump_kb_version
+from app.services.rate_limiter import rate_limiter, estimate_tokens, PRIORITY_BACKGROUND
 
 
-class DocumentService:
-    """Service for processing and indexing documents."""
+def create_text_splitter(strategy: str, size: int, overlap: int):
+    """
+    Create the text splitter for a chunking strategy.
     
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
+    Args:
+        strategy: "structured" (sizes in tokens) or "recursive" (sizes in characters)
+        size: Maximum chunk size
+        overlap: Overlap between consecutive chunks
+        
+    Returns:
+        Splitter exposing split_documents()
+    """
+    if strategy == "structured":
+        return StructuredChunker(chunk_tokens=size, overlap_tokens=overlap)
+    if strategy == "recursive":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=size,
+            chunk_overlap=overlap,
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+    raise ValueError(f"Estrategia de chunking no soportada: {strategy}")
+
+
+class DocumentService:
+    """Service for processing and indexing documents."""
+    
+    def __init__(self):
+        if settings.chunking_strategy == "structured":
+            self.text_splitter = create_text_splitter(
+                "structured", settings.chunk_size_tokens, settings.chunk_overlap_tokens
+            )
+        else:
+            self.text_splitter = create_text_splitter(
+                "recursive", settings.chunk_size, settings.chunk_overlap
+            )
     
     def extract_text_from_pdf(self, file: BinaryIO, filename: str) -> list[Document]:
         """
         Extract text from a PDF file and convert to documents.
         
+        Page texts are cached on disk by file hash, so re-ingesting the same
+        PDF skips extraction.
+        
         Args:
             file: Binary file object
             filename: Name of the file
@@ -28,18 +63,29 @@ class DocumentService:
         Returns:
             List of Document objects with text and metadata
         """
-        pdf_reader = PdfReader(file)
+        data = file.read()
+        pages = None
+        
+        if settings.pdf_cache_enabled:
+            key = pdf_text_cache.make_key(data)
+            pages = pdf_text_cache.get(key)
+        
+        if pages is None:
+            pdf_reader = PdfReader(BytesIO(data))
+            pages = [page.extract_text() for page in pdf_reader.pages]
+            if settings.pdf_cache_enabled:
+                pdf_text_cache.put(key, pages)
+        
         documents = []
         
-        for page_num, page in enumerate(pdf_reader.pages, start=1):
-            text = page.extract_text()
+        for page_num, text in enumerate(pages, start=1):
             if text.strip():  # Only add non-empty pages
                 doc = Document(
                     page_content=text,
                     metadata={
                         "filename": filename,
                         "page": page_num,
-                        "total_pages": len(pdf_reader.pages)
+                        "total_pages": len(pages)
                     }
                 )
                 documents.append(doc)
@@ -74,6 +120,13 @@ class DocumentService:
         texts = [doc.page_content for doc in documents]
         metadatas = [doc.metadata for doc in documents]
         
+        # Ingestion yields to chat traffic on the embedding model's limits
+        await rate_limiter.acquire(
+            settings.openai_embedding_model,
+            sum(estimate_tokens(text) for text in texts),
+            priority=PRIORITY_BACKGROUND
+        )
+        
         # Add to vector store
         await vector_store.aadd_texts(texts=texts, metadatas=metadatas)
         
@@ -106,6 +159,9 @@ class DocumentService:
         # Index into vector store
         num_indexed = await self.index_documents(chunks)
         
+        # Invalidate cached answers on every worker
+        await asyncio.to_thread(bump_kb_version)
+        
         return chunks_deleted, num_indexed
 
 
@@ -0,0 +1,79 @@
+"""
+In-process metrics registry for counters and latency observations.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class Metrics:
+    """Thread-safe registry of counters and timing summaries."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._timings: dict[str, dict[str, float]] = {}
+    
+    def increment(self, name: str, value: float = 1.0) -> None:
+        """
+        Increase a counter.
+        
+        Args:
+            name: Counter name
+            value: Amount to add (default: 1)
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + value
+    
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Record a latency observation.
+        
+        Args:
+            name: Timing name
+            seconds: Observed duration in seconds
+        """
+        with self._lock:
+            timing = self._timings.setdefault(
+                name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            timing["count"] += 1
+            timing["total_seconds"] += seconds
+            timing["max_seconds"] = max(timing["max_seconds"], seconds)
+    
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block and record it under the given name.
+        
+        Args:
+            name: Timing name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+    
+    def snapshot(self) -> dict:
+        """
+        Get a copy of all counters and timing summaries.
+        
+        Returns:
+            dict: Counters and timings with average latency per timing
+        """
+        with self._lock:
+            timings = {
+                name: {
+                    **timing,
+                    "avg_seconds": timing["total_seconds"] / timing["count"] if timing["count"] else 0.0
+                }
+                for name, timing in self._timings.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings}
+
+
+# Singleton instance
+metrics = Metrics()
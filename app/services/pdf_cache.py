@@ -0,0 +1,153 @@
+"""
+On-disk cache of text extracted from PDFs.
+
+Extraction with pypdf is the slowest CPU step of ingestion and its output
+only depends on the file bytes and the pypdf version, so re-ingesting the
+same PDF (after a chunking change or a failed embedding step) reuses it.
+
+Each PDF is one gzip-compressed JSONL file named after the SHA-256 of the
+pypdf version and the file bytes, with one {"page", "text"} line per page.
+The directory is bounded in size: least recently used files (by mtime,
+refreshed on every hit) are evicted first.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+import pypdf
+from app.config import settings
+from app.services.metrics import metrics
+
+
+class PdfTextCache:
+    """Size-bounded LRU cache of per-page PDF text."""
+
+    SUFFIX = ".jsonl.gz"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(data: bytes) -> str:
+        """
+        Build the cache key of a PDF.
+
+        Args:
+            data: PDF file bytes
+
+        Returns:
+            Hex SHA-256 of the pypdf version and the file bytes
+        """
+        digest = hashlib.sha256(f"pypdf-{pypdf.__version__}\n".encode("utf-8"))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def get(self, key: str) -> Optional[list[str]]:
+        """
+        Get the cached page texts of a PDF.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Text of every page in order (empty pages included), or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                pages = [json.loads(line)["text"] for line in file]
+            # Mark as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            metrics.increment("pdf_cache.misses")
+            return None
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            print(f"Error reading PDF cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            metrics.increment("pdf_cache.misses")
+            return None
+
+        metrics.increment("pdf_cache.hits")
+        return pages
+
+    def put(self, key: str, pages: list[str]) -> None:
+        """
+        Store the page texts of a PDF, then evict old entries if over the size limit.
+
+        Write failures (disk full, read-only directory) are logged and the
+        entry is skipped: the cache is an optimization, never a reason to
+        fail ingestion.
+
+        Args:
+            key: Key from make_key
+            pages: Text of every page in order
+        """
+        path = self._path(key)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with gzip.open(temporary, "wt", encoding="utf-8", compresslevel=6) as file:
+                for number, text in enumerate(pages, start=1):
+                    file.write(json.dumps({"page": number, "text": text}, ensure_ascii=False) + "\n")
+            # Atomic: concurrent readers never see a partial file
+            os.replace(temporary, path)
+            self.evict(keep=path)
+        except OSError as e:
+            print(f"Error writing PDF cache entry {path.name}: {e}")
+            metrics.increment("pdf_cache.write_errors")
+            try:
+                temporary.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            keep: Entry never to evict (the one just written)
+
+        Returns:
+            Number of entries deleted
+        """
+        with self._lock:
+            entries = []
+            for path in self.directory.glob(f"*{self.SUFFIX}"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            deleted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
+                deleted += 1
+
+        metrics.increment("pdf_cache.evictions", deleted)
+        return deleted
+
+    def size(self) -> tuple[int, int]:
+        """Get the number of entries and their total size in bytes."""
+        sizes = [path.stat().st_size for path in self.directory.glob(f"*{self.SUFFIX}")]
+        return len(sizes), sum(sizes)
+
+
+# Singleton instance
+pdf_text_cache = PdfTextCache(settings.pdf_cache_dir, settings.pdf_cache_max_bytes)
@@ -0,0 +1,281 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from app.config import settings
+from app.services.metrics import metrics
+
+
+# Scheduling priorities (lower is served first)
+PRIORITY_CONTINUING = 0  # Multi-turn conversation already in progress
+PRIORITY_NEW = 1  # First turn of a new conversation
+PRIORITY_BACKGROUND = 2  # Ingestion and other offline work
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot be admitted within the allowed wait."""
+
+    def __init__(self, model: str, retry_after: float):
+        self.model = model
+        self.retry_after = retry_after
+        super().__init__(
+            f"Límite de solicitudes alcanzado para {model}. "
+            f"Intenta de nuevo en {retry_after:.0f} segundos."
+        )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimate the number of tokens in a text (~4 characters per token).
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        Estimated token count (at least 1)
+    """
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Requests-per-minute and tokens-per-minute buckets for a single model."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.requests = self.request_capacity
+        self.tokens = self.token_capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+
+    def clamp(self, tokens: int) -> float:
+        """Cap a cost at the bucket capacity so oversized calls can still run."""
+        return min(float(tokens), self.token_capacity)
+
+    def clamp_requests(self, requests: int) -> float:
+        """Cap a request count at the bucket capacity so multi-call turns can still run."""
+        return min(float(max(1, requests)), self.request_capacity)
+
+    def wait_time(self, requests: float, tokens: float) -> float:
+        """
+        Seconds until the given amount of requests and tokens is available.
+
+        Args:
+            requests: Number of requests needed
+            tokens: Number of tokens needed
+
+        Returns:
+            Seconds to wait (0 if available now)
+        """
+        with self._lock:
+            self._refill()
+            request_wait = max(0.0, requests - self.requests) / self.request_rate
+            token_wait = max(0.0, tokens - self.tokens) / self.token_rate
+            return max(request_wait, token_wait)
+
+    def try_consume(self, tokens: float, requests: float = 1) -> float:
+        """
+        Consume the given requests and tokens if available.
+
+        Args:
+            tokens: Estimated token cost of the call
+            requests: Number of provider requests the call makes
+
+        Returns:
+            0 if consumed, otherwise the seconds to wait before retrying
+        """
+        with self._lock:
+            self._refill()
+            if self.requests >= requests and self.tokens >= tokens:
+                self.requests -= requests
+                self.tokens -= tokens
+                return 0.0
+            request_wait = max(0.0, requests - self.requests) / self.request_rate
+            token_wait = max(0.0, tokens - self.tokens) / self.token_rate
+            return max(request_wait, token_wait)
+
+
+class RateLimiter:
+    """
+    Client-side admission control for LLM and embedding providers.
+
+    Keeps one token bucket per model and a bounded priority queue of
+    waiting calls. Calls that cannot be admitted within max_wait seconds,
+    or that arrive when the queue is full, are rejected immediately with
+    RateLimitExceeded so the caller can answer 503 + Retry-After.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        overrides: dict[str, tuple[int, int]],
+        max_queue: int,
+        max_wait: float,
+        worker_count: int = 1
+    ):
+        self.enabled = enabled
+        self.worker_count = max(1, worker_count)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.overrides = overrides
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._buckets: dict[str, TokenBucket] = {}
+        self._queues: dict[str, list] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def get_bucket(self, model: str) -> TokenBucket:
+        """Get (or lazily create) the token bucket for a model."""
+        with self._lock:
+            bucket = self._buckets.get(model)
+            if bucket is None:
+                rpm, tpm = self.overrides.get(
+                    model, (self.requests_per_minute, self.tokens_per_minute)
+                )
+                # Provider limits are per account: each worker gets its share
+                bucket = self._buckets[model] = TokenBucket(
+                    max(1, rpm // self.worker_count),
+                    max(1, tpm // self.worker_count)
+                )
+            return bucket
+
+    def _projected_wait(
+        self, model: str, bucket: TokenBucket, tokens: float, requests: float, priority: int
+    ) -> float:
+        # Only waiters that would be served first delay this call
+        queue = self._queues.get(model, [])
+        pending = [entry for entry in queue if not entry[3].done() and entry[0] <= priority]
+        queued_requests = sum(entry[4] for entry in pending)
+        queued_tokens = sum(entry[2] for entry in pending)
+        return bucket.wait_time(queued_requests + requests, queued_tokens + tokens)
+
+    async def acquire(
+        self, model: str, tokens: int, priority: int = PRIORITY_NEW, requests: int = 1
+    ) -> None:
+        """
+        Wait until a call to the model may proceed.
+
+        Args:
+            model: Model name the call is made against
+            tokens: Estimated token cost of the call
+            priority: Scheduling priority (PRIORITY_*)
+            requests: Provider requests the call makes (e.g. 2 for a RAG turn:
+                tool selection and final answer)
+
+        Raises:
+            RateLimitExceeded: If the queue is full or the wait would exceed max_wait
+        """
+        if not self.enabled:
+            return
+
+        bucket = self.get_bucket(model)
+        cost = bucket.clamp(tokens)
+        calls = bucket.clamp_requests(requests)
+        queue = self._queues.setdefault(model, [])
+
+        if not queue and bucket.try_consume(cost, calls) == 0:
+            metrics.increment(f"rate_limit.{model}.admitted")
+            return
+
+        projected_wait = self._projected_wait(model, bucket, cost, calls, priority)
+        queued = sum(1 for entry in queue if not entry[3].done())
+        if queued >= self.max_queue or projected_wait > self.max_wait:
+            metrics.increment(f"rate_limit.{model}.rejected")
+            raise RateLimitExceeded(model, retry_after=max(1.0, projected_wait))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue, (priority, next(self._sequence), cost, future, calls))
+        self._dispatch(model)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            metrics.increment(f"rate_limit.{model}.rejected")
+            raise RateLimitExceeded(
+                model, retry_after=max(1.0, self._projected_wait(model, bucket, cost, calls, priority))
+            )
+        finally:
+            # Cancelled or timed-out waiters are skipped by the dispatcher
+            self._dispatch(model)
+
+        metrics.increment(f"rate_limit.{model}.admitted")
+        metrics.observe(f"rate_limit.{model}.queue_wait", time.perf_counter() - start)
+
+    def acquire_sync(self, model: str, tokens: int) -> None:
+        """
+        Blocking variant of acquire for code running in worker threads.
+
+        Args:
+            model: Model name the call is made against
+            tokens: Estimated token cost of the call
+
+        Raises:
+            RateLimitExceeded: If the call cannot be admitted within max_wait
+        """
+        if not self.enabled:
+            return
+
+        bucket = self.get_bucket(model)
+        cost = bucket.clamp(tokens)
+        deadline = time.monotonic() + self.max_wait
+
+        while True:
+            wait = bucket.try_consume(cost)
+            if wait == 0:
+                metrics.increment(f"rate_limit.{model}.admitted")
+                return
+            if time.monotonic() + wait > deadline:
+                metrics.increment(f"rate_limit.{model}.rejected")
+                raise RateLimitExceeded(model, retry_after=max(1.0, wait))
+            time.sleep(wait)
+
+    def _dispatch(self, model: str) -> None:
+        """Admit queued calls in priority order while the bucket allows."""
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+
+        bucket = self.get_bucket(model)
+        queue = self._queues.get(model, [])
+
+        while queue:
+            _, _, cost, future, calls = queue[0]
+            if future.done():
+                heapq.heappop(queue)
+                continue
+
+            wait = bucket.try_consume(cost, calls)
+            if wait > 0:
+                loop = asyncio.get_running_loop()
+                self._timers[model] = loop.call_later(wait, self._dispatch, model)
+                return
+
+            heapq.heappop(queue)
+            future.set_result(None)
+
+
+# Singleton instance
+rate_limiter = RateLimiter(
+    enabled=settings.rate_limit_enabled,
+    requests_per_minute=settings.rate_limit_requests_per_minute,
+    tokens_per_minute=settings.rate_limit_tokens_per_minute,
+    overrides=settings.rate_limit_overrides,
+    max_queue=settings.rate_limit_max_queue,
+    max_wait=settings.rate_limit_max_wait,
+    worker_count=settings.worker_count
+)
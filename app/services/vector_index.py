@@ -0,0 +1,192 @@
+"""
+In-memory vector index with optional reduced dimensions and quantized storage.
+
+Used by offline tools (benchmarks, parameter sweeps) and any local index, so
+that storage size and search cost can be traded against recall:
+
+- Dimensions: text-embedding-3 vectors can be truncated to their first N
+  components and re-normalized (this is what the API's `dimensions` does)
+- Precision: float32 (4 bytes/dim), float16 (2 bytes/dim) or int8 with a
+  per-vector scale (1 byte/dim + 4 bytes)
+
+It also provides maximal marginal relevance reranking of retrieved candidates.
+"""
+
+import time
+from typing import Optional
+import numpy as np
+
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize vectors so dot products are cosine similarities.
+
+    Args:
+        vectors: Array of shape (n, dims) or (dims,)
+
+    Returns:
+        Normalized float32 array of the same shape
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def reduce_dimensions(vectors: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    """
+    Shorten embeddings to their first components and re-normalize them.
+
+    Args:
+        vectors: Array of shape (n, dims) or (dims,)
+        dimensions: Target dimensions (None keeps all of them)
+
+    Returns:
+        Normalized float32 array with at most `dimensions` components
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dimensions is not None:
+        vectors = vectors[..., :dimensions]
+    return normalize(vectors)
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    budget_seconds: Optional[float] = None
+) -> list[int]:
+    """
+    Select k diverse candidates with maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, selected)); the
+    candidate-to-candidate similarities are computed once as a matrix and the
+    running maximum is updated in place, so each step is one vector operation.
+
+    Args:
+        query: Query vector of shape (dims,)
+        candidates: Candidate vectors of shape (n, dims)
+        k: Number of candidates to select
+        lambda_mult: 1 = pure relevance, 0 = pure diversity
+        budget_seconds: Time limit; when exceeded, the remaining slots are
+            filled in relevance order
+
+    Returns:
+        Indexes into candidates, in selection order
+    """
+    start = time.perf_counter()
+    candidates = normalize(np.atleast_2d(candidates))
+    k = min(k, len(candidates))
+    if k == 0:
+        return []
+
+    relevance = candidates @ normalize(query)
+    pairwise = candidates @ candidates.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+    max_similarity = pairwise[first].copy()
+
+    while len(selected) < k:
+        if budget_seconds is not None and time.perf_counter() - start > budget_seconds:
+            remaining = np.flatnonzero(available)
+            remaining = remaining[np.argsort(-relevance[remaining])]
+            selected.extend(int(i) for i in remaining[:k - len(selected)])
+            break
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, pairwise[best], out=max_similarity)
+
+    return selected
+
+
+class LocalVectorIndex:
+    """Exact cosine-similarity index over normalized vectors in a chosen precision."""
+
+    def __init__(self, precision: str = "float32"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Precisión no soportada: {precision} (usa {', '.join(PRECISIONS)})")
+        self.precision = precision
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return 0 if self._vectors is None else len(self._vectors)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored vectors (and int8 scales)."""
+        if self._vectors is None:
+            return 0
+        scales = self._scales.nbytes if self._scales is not None else 0
+        return self._vectors.nbytes + scales
+
+    def add(self, vectors: np.ndarray) -> None:
+        """
+        Add vectors to the index.
+
+        Args:
+            vectors: Array of shape (n, dims); normalized before storage
+        """
+        vectors = normalize(np.atleast_2d(vectors))
+
+        if self.precision == "int8":
+            scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+            scales = np.maximum(scales, 1e-12).astype(np.float32)
+            stored = np.round(vectors / scales).astype(np.int8)
+        else:
+            scales = None
+            stored = vectors.astype(self.precision)
+
+        if self._vectors is None:
+            self._vectors, self._scales = stored, scales
+        else:
+            self._vectors = np.vstack([self._vectors, stored])
+            if scales is not None:
+                self._scales = np.vstack([self._scales, scales])
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of a query against every stored vector.
+
+        Args:
+            query: Query vector of shape (dims,)
+
+        Returns:
+            Array of shape (n,) with similarities
+        """
+        if self._vectors is None:
+            return np.empty(0, dtype=np.float32)
+        query = normalize(query)
+        if self.precision == "int8":
+            return (self._vectors @ query) * self._scales[:, 0]
+        # float16 storage is upcast per search so the dot product stays accurate
+        return self._vectors.astype(np.float32, copy=False) @ query
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar stored vectors.
+
+        Args:
+            query: Query vector of shape (dims,)
+            k: Number of results
+
+        Returns:
+            Tuple of (indices, similarities), best first
+        """
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
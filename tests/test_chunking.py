@@ -0,0 +1,45 @@
+"""
+Script para probar el chunking estructurado sobre Wilmer.pdf, sin servidor:
+
+    python tests/test_chunking.py
+"""
+
+from pathlib import Path
+from app.services.document_service import document_service
+
+
+PDF_PATH = Path(__file__).parent.parent / "Wilmer.pdf"
+
+EXPECTED_SECTIONS = [
+    "Perfil Biográfico y Profesional del Candidato",
+    "Identidad Política y Alianza LIBRE",
+    "Ejes Programáticos: Lucha Frontal contra la Corrupción",
+    "Posicionamiento ante la Competencia y Guerra Sucia",
+]
+
+
+def test_chunking():
+    """Dividir el PDF real y comprobar que cada chunk conoce su sección."""
+    print("="*60)
+    print("🔍 TEST: Chunking por secciones de Wilmer.pdf")
+    print("="*60 + "\n")
+
+    with open(PDF_PATH, "rb") as file:
+        documents = document_service.extract_text_from_pdf(file, PDF_PATH.name)
+    chunks = document_service.chunk_documents(documents)
+
+    for chunk in chunks:
+        print(f"📄 Página {chunk.metadata.get('page')}, {chunk.metadata.get('tokens')} tokens: {chunk.metadata['section']}")
+
+    sections = [chunk.metadata["section"].split(" > ")[-1] for chunk in chunks]
+    missing = [section for section in EXPECTED_SECTIONS if section not in sections]
+    untitled = [chunk for chunk in chunks if not chunk.metadata["section"]]
+
+    print(f"\n{'✅' if not missing else '❌'} Secciones detectadas: {len(EXPECTED_SECTIONS) - len(missing)}/{len(EXPECTED_SECTIONS)}")
+    print(f"{'✅' if not untitled else '❌'} Chunks sin sección: {len(untitled)}")
+    print("\n" + "="*60)
+    assert not missing and not untitled
+
+
+if __name__ == "__main__":
+    test_chunking()
@@ -0,0 +1,162 @@
+"""
+Script para probar el coalescing de preguntas idénticas y el stream de /api/chat,
+sin servidor ni proveedores (el turno del agente se reemplaza por uno simulado):
+
+    python tests/test_coalescing.py
+"""
+
+import asyncio
+import time
+import uuid
+import app.routes.chat as chat
+from app.agent.deadline import DeadlineExceeded
+from app.services.chat_service import ChatTurnResult
+from app.services.data_stream import DataStreamWriter
+
+
+class FakeTurns:
+    """Turno del agente simulado: cuenta ejecuciones y puede fallar la primera."""
+
+    def __init__(self, delay: float = 0.2, fail_first: bool = False, error: Exception = None):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.error = error or RuntimeError("429 del proveedor")
+        self.runs = 0
+        self.deadlines = []
+
+    async def __call__(self, message, conversation_history, route, callbacks=None, usage=None, deadline=None):
+        self.runs += 1
+        run = self.runs
+        await asyncio.sleep(self.delay)
+        # Deadline de la ejecución al terminar (los seguidores pueden extenderlo)
+        self.deadlines.append(deadline.at if deadline is not None else None)
+        if self.fail_first and run == 1:
+            raise self.error
+        return ChatTurnResult(f"respuesta {run}", True)
+
+
+async def admit_all(*args, **kwargs):
+    return None
+
+
+async def degraded_answer(message, route, tool_outputs, timeout):
+    return "respuesta degradada"
+
+
+async def consume(message: str, deadline: float = None) -> str:
+    frames = []
+    async for frame in chat.generate_chat_stream(message, [], "rag", f"test:{message}", deadline, False):
+        frames.append(frame)
+    return "".join(frames)
+
+
+def check(ok: bool, description: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {description}")
+    return ok
+
+
+async def test_followers_share_one_run() -> bool:
+    chat.run_chat_turn = turns = FakeTurns()
+    message = f"agua {uuid.uuid4()}"
+    results = await asyncio.gather(*(consume(message) for _ in range(4)))
+    return check(
+        turns.runs == 1 and all('0:"respuesta 1"' in result for result in results),
+        f"4 solicitudes idénticas -> {turns.runs} ejecución(es) del agente"
+    )
+
+
+async def test_follower_disconnect_then_leader_fails() -> bool:
+    chat.run_chat_turn = turns = FakeTurns(fail_first=True)
+    message = f"salud {uuid.uuid4()}"
+    leader = asyncio.create_task(consume(message))
+    await asyncio.sleep(0.01)
+    gone = asyncio.create_task(consume(message))
+    waiting = asyncio.create_task(consume(message))
+    await asyncio.sleep(0.05)
+    gone.cancel()  # El cliente del seguidor se desconecta
+    await asyncio.gather(leader, gone, waiting, return_exceptions=True)
+    # Líder fallido + fallback del seguidor que sigue conectado; nada para el desconectado
+    return check(turns.runs == 2, f"seguidor desconectado y líder fallido -> {turns.runs} ejecuciones (esperado: 2)")
+
+
+async def test_leader_disconnect_keeps_run_for_followers() -> bool:
+    chat.run_chat_turn = turns = FakeTurns()
+    message = f"empleo {uuid.uuid4()}"
+    leader = asyncio.create_task(consume(message))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(consume(message))
+    await asyncio.sleep(0.05)
+    leader.cancel()  # El cliente del líder se desconecta
+    result = await follower
+    await asyncio.gather(leader, return_exceptions=True)
+    return check(
+        turns.runs == 1 and '0:"respuesta 1"' in result,
+        "líder desconectado con un seguidor esperando -> el seguidor recibe la respuesta compartida"
+    )
+
+
+async def test_follower_extends_deadline() -> bool:
+    chat.run_chat_turn = turns = FakeTurns(delay=0.3)
+    message = f"vivienda {uuid.uuid4()}"
+    reserve = chat.settings.chat_deadline_reserve_seconds
+    leader = asyncio.create_task(consume(message, time.monotonic() + reserve + 5))
+    await asyncio.sleep(0.05)
+    follower_deadline = time.monotonic() + reserve + 10
+    await asyncio.gather(leader, consume(message, follower_deadline))
+    return check(
+        turns.runs == 1 and abs(turns.deadlines[0] - (follower_deadline - reserve)) < 1e-6,
+        "la ejecución compartida usa el deadline del último en esperar"
+    )
+
+
+async def test_leader_deadline_is_not_retried() -> bool:
+    chat.run_chat_turn = turns = FakeTurns(fail_first=True, error=DeadlineExceeded())
+    message = f"transporte {uuid.uuid4()}"
+    deadline = time.monotonic() + chat.settings.chat_deadline_reserve_seconds + 5
+    leader = asyncio.create_task(consume(message, deadline))
+    await asyncio.sleep(0.01)
+    results = await asyncio.gather(leader, consume(message, deadline), consume(message, deadline))
+    return check(
+        turns.runs == 1 and all("respuesta degradada" in result for result in results),
+        f"líder sin tiempo -> {turns.runs} ejecución(es) y respuesta degradada para todos"
+    )
+
+
+def test_writer_coalesces_text() -> bool:
+    writer = DataStreamWriter(flush_interval=60, max_buffer_chars=1000)
+    for token in ["Ho", "la", ", ", "vecino"]:
+        writer.write_text(token)
+    writer.tool_call("1", "buscar_propuestas", {"query": "agua"})
+    writer.write_text("!")
+    writer.finish("stop")
+    expected = (
+        '0:"Hola, vecino"\n'
+        '9:{"toolCallId":"1","toolName":"buscar_propuestas","args":{"query":"agua"}}\n'
+        '0:"!"\n'
+        'd:{"finishReason":"stop"}\n'
+    )
+    return check(writer.flush() == expected and writer.flush() == "", "el writer une los tokens y conserva el orden de los frames")
+
+
+async def main():
+    print("="*60)
+    print("🔍 TEST: Coalescing y stream de /api/chat")
+    print("="*60 + "\n")
+
+    chat.rate_limiter.acquire = admit_all
+    chat.build_degraded_answer = degraded_answer
+    results = [
+        await test_followers_share_one_run(),
+        await test_follower_disconnect_then_leader_fails(),
+        await test_leader_disconnect_keeps_run_for_followers(),
+        await test_follower_extends_deadline(),
+        await test_leader_deadline_is_not_retried(),
+        test_writer_coalesces_text(),
+    ]
+
+    print("\n" + "="*60)
+    assert all(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
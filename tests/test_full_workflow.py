@@ -46,7 +46,7 @@ def ingest_pdf(pdf_path: str):
     print("⏳ Procesando...")
     print("   - Eliminando chunks existentes en Supabase")
     print("   - Extrayendo texto del PDF")
-    print("   - Dividiendo en chunks (1000 chars, overlap 200)")
+    print("   - Dividiendo en chunks por secciones y listas (tokens)")
     print("   - Generando embeddings con OpenAI")
     print("   - Indexando en Supabase vector store\n")
     
@@ -0,0 +1,54 @@
+"""
+Script para probar la clasificación de turnos (chit-chat vs RAG), sin servidor:
+
+    python tests/test_router.py
+"""
+
+from app.agent.router import classify_turn, ROUTE_CHITCHAT, ROUTE_RAG
+
+
+HISTORY = [{"role": "user", "content": "hola"}]
+
+CASES = [
+    # (mensaje, historial, ruta esperada)
+    ("Hola", [], ROUTE_CHITCHAT),
+    ("¡Buenas tardes, doctor!", [], ROUTE_CHITCHAT),
+    ("ok muchas gracias", HISTORY, ROUTE_CHITCHAT),
+    ("chau, hasta luego", HISTORY, ROUTE_CHITCHAT),
+    ("Hola, ¿qué propones para los jóvenes?", [], ROUTE_RAG),
+    ("hola que haces por el alto", [], ROUTE_RAG),
+    ("hola, cómo vas a ayudar a los vecinos", [], ROUTE_RAG),
+    ("buenas, y los jóvenes?", [], ROUTE_RAG),
+    ("y los jóvenes", HISTORY, ROUTE_RAG),
+    ("gracias, y el agua", HISTORY, ROUTE_RAG),
+    ("¿Cuál es tu plan contra la corrupción?", [], ROUTE_RAG),
+    ("si", HISTORY, ROUTE_RAG),
+    ("Sí, claro", HISTORY, ROUTE_RAG),
+    ("no", HISTORY, ROUTE_RAG),
+    ("dale", HISTORY, ROUTE_RAG),
+    ("ya, bueno", HISTORY, ROUTE_RAG),
+    ("si", [], ROUTE_CHITCHAT),
+    ("ok gracias", HISTORY, ROUTE_CHITCHAT),
+]
+
+
+def test_router():
+    """Clasificar mensajes de ejemplo y comparar con la ruta esperada."""
+    print("="*60)
+    print("🔍 TEST: Clasificación de turnos")
+    print("="*60 + "\n")
+
+    failures = 0
+    for message, history, expected in CASES:
+        route = classify_turn(message, history)
+        ok = route == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {message!r} -> {route} (esperado: {expected})")
+
+    print("\n" + "="*60)
+    print(f"{'✅ Todo correcto' if not failures else f'❌ {failures} fallos'}")
+    assert not failures
+
+
+if __name__ == "__main__":
+    test_router()